@@ -1,5 +1,5 @@
-from pydian.dicts import get
+from pydian.dicts import IndexedSource, Table, build, get
 from pydian.lib.types import DROP
-from pydian.mapper import Mapper
+from pydian.mapper import Mapper, Pipeline
 
-__all__ = ["DROP", "Mapper", "get"]
+__all__ = ["DROP", "IndexedSource", "Mapper", "Pipeline", "Table", "build", "get"]
@@ -0,0 +1,243 @@
+import csv
+import os
+import sys
+from array import array
+from typing import Any, Iterable, Sequence
+
+from .dicts import _get_tokenized_keypath
+
+try:
+    import numpy as np  # type: ignore[import]
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore
+
+# Column type -> (`array` typecode, `.npy` dtype descriptor)
+_NUMERIC_TYPES = {
+    "int": ("q", "i8"),
+    "float": ("d", "f8"),
+    "bool": ("b", "b1"),
+}
+COLUMN_TYPES = (*_NUMERIC_TYPES, "object")
+
+# Column type -> wider column types to try, in order, when a value doesn't fit
+_WIDER_TYPES = {
+    "int": ("float", "object"),
+    "float": ("object",),
+    "bool": ("object",),
+    "object": (),
+}
+_INT64_RANGE = range(-(2**63), 2**63)
+
+
+def infer_schema(results: Iterable[dict[str, Any]], sample_size: int = 100) -> dict[str, str]:
+    """
+    Infers a flattened schema (key path -> column type) from the first `sample_size` results.
+
+    Key paths use the `get` syntax, e.g. `a.b[0].c`. Column types are one of:
+      `int` (64-bit), `float` (ints and floats), `bool`, or `object` (anything else).
+    """
+    types_by_path: dict[str, set[type]] = {}
+    for i, res in enumerate(results):
+        if i >= sample_size:
+            break
+        _collect_leaf_types(res, "", types_by_path)
+    return {path: _column_type(types) for path, types in types_by_path.items()}
+
+
+class Columns:
+    """
+    Column buffers for a batch of (nested) results, with one column per key path of the schema.
+
+    Numeric columns are pre-allocated NumPy arrays when NumPy is installed, and `array.array`s
+      otherwise, with nulls tracked in `nulls`. Object columns are lists with `None` for nulls.
+
+    Values are checked against their column type before being stored (the same way for both
+      backends). A value that doesn't fit raises a `ValueError`, unless `widen` is set: then the
+      column is widened to the first type that fits all of its values (`int` -> `float` ->
+      `object`, or `bool` -> `object`), and `schema` is updated.
+    """
+
+    def __init__(
+        self, results: Sequence[dict[str, Any]], schema: dict[str, str], widen: bool = False
+    ) -> None:
+        for path, column_type in schema.items():
+            if column_type not in COLUMN_TYPES:
+                raise ValueError(f"Invalid column type for {path}: {column_type}")
+        self.schema = dict(schema)
+        self.length = len(results)
+        self.columns: dict[str, Any] = {}
+        self.nulls: dict[str, bytearray] = {}
+        for path, column_type in schema.items():
+            keypath = _get_tokenized_keypath(path)
+            values = [_lookup(res, keypath) for res in results]
+            for v in values:
+                if v is not None and not _fits(column_type, v):
+                    if not widen:
+                        raise ValueError(f"Value {v!r} at {path} is not a valid {column_type}")
+                    column_type = self.schema[path] = _widened_type(column_type, values)
+                    break
+            if column_type == "object":
+                self.columns[path] = values
+                continue
+            buffer = _allocate(column_type, self.length)
+            nulls = bytearray(self.length)
+            for i, v in enumerate(values):
+                if v is None:
+                    nulls[i] = 1
+                else:
+                    buffer[i] = v
+            if column_type == "float" and any(nulls):
+                for i in _indices(nulls):
+                    buffer[i] = float("nan")
+            self.columns[path] = buffer
+            self.nulls[path] = nulls
+
+    def __len__(self) -> int:
+        return self.length
+
+    def column(self, path: str) -> list[Any]:
+        """
+        Returns the column as a list, with `None` for nulls
+        """
+        values = self.columns[path]
+        values = values.tolist() if hasattr(values, "tolist") else list(values)
+        if (nulls := self.nulls.get(path)) is not None:
+            for i in _indices(nulls):
+                values[i] = None
+        if self.schema[path] == "bool":
+            return [bool(v) if v is not None else None for v in values]
+        return values
+
+    def to_csv(self, path: str) -> None:
+        """
+        Writes the columns to a CSV file, with a header row of key paths. Nulls are empty cells.
+        """
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(self.schema)
+            writer.writerows(zip(*(self.column(p) for p in self.schema)))
+
+    def to_npy(self, directory: str, paths: Iterable[str] | None = None) -> None:
+        """
+        Writes each numeric column to `{directory}/{key path}.npy`, along with a boolean
+          `{key path}.nulls.npy` mask for columns with nulls. Null floats are also NaN.
+
+        By default all numeric columns are written. Object columns aren't supported.
+        """
+        if paths is None:
+            paths = [p for p, t in self.schema.items() if t != "object"]
+        os.makedirs(directory, exist_ok=True)
+        for path in paths:
+            column_type = self.schema[path]
+            if column_type == "object":
+                raise ValueError(f"Can only write numeric columns to .npy, got {path}")
+            descr = _NUMERIC_TYPES[column_type][1]
+            _write_npy(os.path.join(directory, f"{path}.npy"), descr, self.columns[path])
+            if any(nulls := self.nulls[path]):
+                _write_npy(os.path.join(directory, f"{path}.nulls.npy"), "b1", nulls)
+
+
+def to_columns(
+    results: Sequence[dict[str, Any]], schema: Sequence[str] | dict[str, str] | None = None
+) -> Columns:
+    """
+    Fills column buffers from a batch of results (e.g. from `Mapper.map_many`).
+
+    `schema` is either a dict of key path -> column type, a list of key paths (types inferred),
+      or `None` to infer both from the results (see `infer_schema`). Inferred column types are
+      only based on a sample of the results, so they're widened if later values don't fit.
+
+    Values are read straight from each result, so missing (and removed-empty) fields are nulls.
+    """
+    if isinstance(schema, dict):
+        return Columns(results, schema)
+    inferred = infer_schema(results)
+    if schema is not None:
+        inferred = {p: inferred.get(p, "object") for p in schema}
+    return Columns(results, inferred, widen=True)
+
+
+def _collect_leaf_types(obj: Any, path: str, res: dict[str, set[type]]) -> None:
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            _collect_leaf_types(v, f"{path}.{k}" if path else k, res)
+    elif isinstance(obj, list):
+        for i, v in enumerate(obj):
+            _collect_leaf_types(v, f"{path}[{i}]", res)
+    elif obj is not None:
+        res.setdefault(path, set()).add(type(obj))
+
+
+def _column_type(types: set[type]) -> str:
+    if types == {bool}:
+        return "bool"
+    if types == {int}:
+        return "int"
+    if types and types <= {int, float}:
+        return "float"
+    return "object"
+
+
+def _fits(column_type: str, v: Any) -> bool:
+    t = type(v)
+    if column_type == "int":
+        return t is int and v in _INT64_RANGE
+    if column_type == "float":
+        return t is float or (t is int and abs(v) <= sys.float_info.max)
+    if column_type == "bool":
+        return t is bool
+    return True
+
+
+def _widened_type(column_type: str, values: list[Any]) -> str:
+    for wider in _WIDER_TYPES[column_type]:
+        if all(v is None or _fits(wider, v) for v in values):
+            return wider
+    return "object"
+
+
+def _lookup(obj: Any, keypath: tuple[str | int, ...]) -> Any:
+    for k in keypath:
+        if isinstance(k, int):
+            if not isinstance(obj, list) or not -len(obj) <= k < len(obj):
+                return None
+            obj = obj[k]
+        elif isinstance(obj, dict):
+            obj = obj.get(k)
+        else:
+            return None
+        if obj is None:
+            return None
+    return obj
+
+
+def _allocate(column_type: str, length: int) -> Any:
+    typecode = _NUMERIC_TYPES[column_type][0]
+    if np is not None:
+        return np.zeros(length, dtype=np.dtype(typecode if column_type != "bool" else "?"))
+    return array(typecode, bytes(array(typecode).itemsize * length))
+
+
+def _indices(nulls: bytearray) -> Iterable[int]:
+    i = nulls.find(1)
+    while i != -1:
+        yield i
+        i = nulls.find(1, i + 1)
+
+
+def _write_npy(path: str, descr: str, buffer: Any) -> None:
+    """
+    Writes a 1-D buffer as a version 1.0 `.npy` file (so NumPy isn't required)
+    """
+    byteorder = "|" if descr == "b1" else ("<" if sys.byteorder == "little" else ">")
+    header = (
+        f"{{'descr': '{byteorder}{descr}', 'fortran_order': False, 'shape': ({len(buffer)},), }}"
+    )
+    # Magic string (6) + version (2) + header length (2) + header, aligned to 64 bytes
+    padding = 64 - (10 + len(header) + 1) % 64
+    header += " " * padding + "\n"
+    with open(path, "wb") as f:
+        f.write(b"\x93NUMPY\x01\x00")
+        f.write(len(header).to_bytes(2, "little"))
+        f.write(header.encode("latin1"))
+        f.write(bytes(buffer) if isinstance(buffer, bytearray) else buffer.tobytes())
@@ -1,9 +1,11 @@
 import re
 from collections import deque
 from itertools import chain
-from typing import Any, Iterable, Sequence, TypeVar
+from typing import Any, Iterable, Iterator, Sequence, TypeVar
 
-from .lib.types import DROP, KEEP, ApplyFunc, ConditionalCheck
+from .lib.context import current_context
+from .lib.counters import ThreadCounters
+from .lib.types import DROP, KEEP, ApplyError, ApplyFunc, ConditionalCheck, Deferred
 from .lib.util import split_key
 
 
@@ -25,15 +27,37 @@ def get(
      - Iterate through and "unwrap" a list using `[*]`
      - Get multiple items using `(firstKey,secondKey)` syntax (outputs as a tuple)
        The keys within the tuple can also be chained with `.`
+     - Iterate through the values of a dict using `*`, e.g. `meta.*.id`
+     - Search at any depth using `..`, e.g. `..coding[*].code` (see `IndexedSource` for
+       repeated searches on the same source)
+     - Join rows of a list using `[?rowKey==sourceKey]`, e.g. `observations[?subject==patient.id]`
+       keeps the rows where `subject` equals `patient.id` in the source (or any of its values
+       if it's a list). The right side can also be a quoted literal, e.g. `[?status=='final']`.
+       Wrap the list in a `Table` to look up matching rows from a hash index instead of scanning
 
     Use `apply` to safely chain operations on a successful get.
 
     Use `only_if` to conditionally decide if the result should be kept + `apply`-ed.
 
     Use `drop_level` to specify conditional dropping if get results in None.
+
+    A failed `apply` raises an `ApplyError`, unless the calling `Mapper` sets `on_error`
+      to collect the error (or ignore it) and use `default` instead.
+
+    If an `apply` function returns a `Deferred` value (e.g. `BatchLoader.load`), the rest of the
+      chain and `drop_level` are handled once the value is loaded.
     """
-    key_list = split_key(key)
-    res = _nested_get(source, key_list, default)
+    context = current_context()
+    if (
+        context is not None
+        and (shape := context.shape) is not None
+        and shape.is_absent(source, key)
+    ):
+        res = default
+    elif context is not None and context.get_cache is not None:
+        res = context.get_cache.get(source, key, default)
+    else:
+        res = _nested_get(source, split_key(key), default)
 
     if res is not None and only_if:
         res = res if only_if(res) else None
@@ -41,20 +65,56 @@ def get(
     if res is not None and apply:
         if not isinstance(apply, Iterable):
             apply = (apply,)
-        for fn in apply:
-            try:
-                res = fn(res)
-            except Exception as e:
-                raise RuntimeError(f"`apply` call {fn} failed for value: {res} at key: {key}, {e}")
-            if res is None:
-                break
+        res = _apply_chain(res, tuple(apply), key, default)
+        if isinstance(res, Deferred):
+            res.drop_level = drop_level
 
     if drop_level and res is None:
         res = drop_level
+    elif isinstance(res, (dict, list, tuple)) and context is not None:
+        # Track values that may be borrowed from the source, see `borrowed_ids`
+        context.borrowed.append(res)
+    return res
+
+
+def _apply_chain(
+    res: Any, apply: Sequence[ApplyFunc], key: str, default: Any, index: int | None = None
+) -> Any:
+    """
+    Calls each function on the result of the previous one, stopping early on `None`.
+
+    A failed call is handled based on the `on_error` policy of the current `Mapper` (if any).
+      The error's `index` is the position of the source being mapped, unless `index` is passed.
+
+    If a function returns a `Deferred` value, the rest of the chain is deferred along with it.
+    """
+    for i, fn in enumerate(apply):
+        try:
+            res = fn(res)
+        except Exception as e:
+            context = current_context()
+            if index is None and context is not None:
+                index = context.source_index
+            error = ApplyError(key, fn, e, res, index)
+            if context is None or context.on_error == "raise":
+                raise error from e
+            if context.on_error == "collect":
+                context.errors.append(error)
+            res = default
+            break
+        if isinstance(res, Deferred):
+            res.apply = tuple(apply[i + 1 :])
+            res.path = key
+            res.default = default
+            break
+        if res is None:
+            break
     return res
 
 
 REGEX_INDEX = re.compile(r"(.*)\[(-?\d*:?-?\d*|\*)\]$")
+REGEX_JOIN = re.compile(r"(.*)\[\?\s*(.+?)\s*==\s*(.+?)\s*\]$")
+REGEX_WRITABLE_PART = re.compile(r"([^.\[\]]+)(?:\[(-?\d+)\])?")
 
 
 def _single_get(source: dict[str, Any], key: str, default: Any = None) -> Any:
@@ -92,7 +152,9 @@ def _single_get(source: dict[str, Any], key: str, default: Any = None) -> Any:
     return source.get(key, default)
 
 
-def _nested_get(source: dict[str, Any], key_list: list[str], default: Any = None) -> Any:
+def _nested_get(
+    source: dict[str, Any], key_list: list[str], default: Any = None, root: Any = None
+) -> Any:
     """
     Expects `.`-delimited string and tries to get the item in the dict.
 
@@ -104,24 +166,49 @@ def _nested_get(source: dict[str, Any], key_list: list[str], default: Any = None
     If [*] is passed, then that means get into each object in the list. E.g. for a list l:
         l[*].a.b
       will return the following: [d['a']['b'] for d in l]
+
+    The right side of a join is relative to `root` (by default, `source`).
     """
     # Handle base cases
     match len(key_list):
         case 0:
             return default
-        case 1:
+        case 1 if key_list[0] not in ("*", "..") and "[?" not in key_list[0]:
             return _single_get(source, key_list[0], default)
 
+    if root is None:
+        root = source
+
     queue = deque(key_list)
-    res = source
+    res: Any = source
     while len(queue) > 0:
         key_part = queue.popleft()
+        # Recursive descent handles the remaining queue items for each match
+        if key_part == "..":
+            return _recursive_get(res, list(queue), default)
+        # Unwrap the values of a dict, same as `[*]` for a list
+        elif key_part == "*":
+            values = list(res.values()) if isinstance(res, dict) else []
+            res = values
+            if len(queue) > 0:
+                res = [
+                    _nested_get(v, list(queue), default, root) if isinstance(v, dict) else default
+                    for v in values
+                ]
+                queue.clear()
         # If need to unwrap, then empty queue
-        if key_part.endswith("[*]"):
+        elif key_part.endswith("[*]"):
             res = res.get(key_part[:-3], [])
             # Handle remaining queue items in the recursive call(s)
             if len(queue) > 0:
-                res = [_nested_get(v, list(queue), default) for v in res]  # type: ignore
+                res = [_nested_get(v, list(queue), default, root) for v in res]
+                queue.clear()
+        # Join rows, then handle remaining queue items for each of them (same as `[*]`)
+        elif key_part.endswith("]") and (match := REGEX_JOIN.fullmatch(key_part)):
+            name, row_key, source_key = match.groups()
+            res = _join(res.get(name) if isinstance(res, dict) else None, row_key, source_key, root)
+            if len(queue) > 0:
+                res = [_nested_get(v, list(queue), default, root) for v in res]
                 queue.clear()
         else:
             res = _single_get(res, key_part, default)
@@ -132,22 +219,384 @@ def _nested_get(source: dict[str, Any], key_list: list[str], default: Any = None
     return res if res is not None else default
 
 
+def _recursive_get(source: Any, key_list: list[str], default: Any = None) -> Any:
+    """
+    Gets `key_list` from every dict within `source` (at any depth) that has the first key,
+      in document order, and returns the non-`None` results as a list. E.g. for a dict d:
+        ..a.b
+      will return [x['a']['b'] for x in (all dicts in d) if 'a' in x]
+
+    If the first key unwraps with `[*]`, the results are flattened into one list.
+
+    If `source` is an `IndexedSource`, the dicts containing the first key are looked up from
+      its index rather than scanning.
+    """
+    if not key_list:
+        return default
+    first_key = key_list[0]
+    if (match := REGEX_INDEX.fullmatch(first_key)) is not None:
+        name = match.group(1)
+    elif "," in first_key or first_key in ("*", ".."):
+        raise ValueError(f"Expected a key name after `..`, got: {first_key}")
+    else:
+        name = first_key
+
+    if isinstance(source, IndexedSource):
+        containing = source.dicts_containing(name)
+    else:
+        containing = [d for d in _iter_dicts(source) if name in d]
+
+    unwrap = first_key.endswith("[*]")
+    res: list[Any] = []
+    for d in containing:
+        if d[name] is None:
+            continue
+        v = _nested_get(d, key_list)
+        if v is None:
+            continue
+        if unwrap and isinstance(v, list):
+            res.extend(v)
+        else:
+            res.append(v)
+    return res if res else default
+
+
+def _iter_dicts(source: Any) -> Iterator[dict[str, Any]]:
+    """
+    Yields every dict within `source` (including itself) in document order
+    """
+    stack = [source]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, dict):
+            yield obj
+            values: Any = obj.values()
+        elif isinstance(obj, (list, tuple)):
+            values = obj
+        else:
+            continue
+        stack.extend(v for v in reversed(values) if isinstance(v, (dict, list, tuple)))
+
+
+class IndexedSource(dict):
+    """
+    A source dict with an index of key name -> dicts containing that key (at any depth).
+
+    The index is built once (on the first recursive descent, e.g. `get(source, "..coding")`),
+      so repeated recursive descent lookups don't rescan the whole source. The index isn't
+      updated, so don't modify the source after wrapping it.
+    """
+
+    def __init__(self, source: dict[str, Any]) -> None:
+        super().__init__(source)
+        self._index: dict[Any, list[dict[str, Any]]] | None = None
+
+    def dicts_containing(self, key: str) -> list[dict[str, Any]]:
+        if self._index is None:
+            index: dict[Any, list[dict[str, Any]]] = {}
+            for d in _iter_dicts(self):
+                for k in d:
+                    index.setdefault(k, []).append(d)
+            self._index = index
+        return self._index.get(key, [])
+
+
+class GetCache:
+    """
+    Cache of `get` lookups by source and key (before `only_if` and `apply`), so repeated
+      lookups of the same path are only resolved once. See `pydian.group.MapperGroup`.
+
+    Sources are kept alive by the cache (so their `id`s stay unique), and aren't expected to
+      change while it's in use. Cached values are shared, so treat them as read-only.
+
+    Safe to share between threads: two threads missing the same key both resolve it (with
+      equal results), rather than one waiting on the other.
+    """
+
+    __slots__ = ("values", "_stats")
+
+    def __init__(self) -> None:
+        self.values: dict[tuple[int, str, Any], tuple[Any, Any]] = {}
+        self._stats = ThreadCounters("hits", "misses")
+
+    @property
+    def hits(self) -> int:
+        return self._stats["hits"]
+
+    @property
+    def misses(self) -> int:
+        return self._stats["misses"]
+
+    def get(self, source: Any, key: str, default: Any = None) -> Any:
+        try:
+            entry = self.values.get((id(source), key, default))
+        except TypeError:
+            # Unhashable default
+            return _nested_get(source, split_key(key), default)
+        if entry is not None:
+            self._stats.slots()[0] += 1
+            return entry[1]
+        self._stats.slots()[1] += 1
+        res = _nested_get(source, split_key(key), default)
+        self.values[(id(source), key, default)] = (source, res)
+        return res
+
+
+class ShapeCache:
+    """
+    Cache of which `get` key paths are absent for each source "shape", i.e. the keys at the top
+      two levels of a source. Pass one to a `Mapper` (`shape_cache=...`) so `get` calls on paths
+      known to be missing return their default (or DROP level) without resolving the path.
+
+    This helps with sparse sources, where most of the (optional) paths of a mapping are missing
+      for any given record. Sources are fingerprinted once per `Mapper` call, so it doesn't pay
+      off for mappings with only a few `get` calls.
+
+    A path is only treated as absent when its first or second part is a key name (optionally
+      indexed, e.g. `code[0]`) that isn't in the source, as then `get` always returns `default`.
+      Once the cache holds `max_shapes` shapes, sources with a new shape aren't short-circuited.
+    """
+
+    __slots__ = ("max_shapes", "shapes", "_stats")
+
+    def __init__(self, max_shapes: int = 1000) -> None:
+        self.max_shapes = max_shapes
+        # Shape -> key path -> whether it's absent
+        self.shapes: dict[tuple[Any, ...], dict[str, bool]] = {}
+        self._stats = ThreadCounters("hits", "misses", "skipped")
+
+    @property
+    def hits(self) -> int:
+        """
+        Number of `get` calls that looked up whether their path is absent from the cache
+        """
+        return self._stats["hits"]
+
+    @property
+    def misses(self) -> int:
+        """
+        Number of `get` calls that checked the source, i.e. the first one per shape and key path
+        """
+        return self._stats["misses"]
+
+    @property
+    def skipped(self) -> int:
+        """
+        Number of `get` calls that returned early, since their path is absent
+        """
+        return self._stats["skipped"]
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def shape(self, source: Any) -> "_SourceShape | None":
+        """
+        Returns the absent paths of `source` (for its shape), or `None` if there's no room for a
+          new shape
+        """
+        if not isinstance(source, dict):
+            return None
+        fingerprint = tuple(
+            [(k, tuple(v) if isinstance(v, dict) else None) for k, v in source.items()]
+        )
+        if (absent := self.shapes.get(fingerprint)) is None:
+            if len(self.shapes) >= self.max_shapes:
+                return None
+            absent = self.shapes.setdefault(fingerprint, {})
+        return _SourceShape(source, absent, self._stats)
+
+    def clear(self) -> None:
+        self.shapes.clear()
+        self._stats.clear()
+
+
+class _SourceShape:
+    """
+    The absent key paths for the shape of `source`, see `ShapeCache`
+    """
+
+    __slots__ = ("source", "absent", "stats")
+
+    def __init__(self, source: Any, absent: dict[str, bool], stats: ThreadCounters) -> None:
+        self.source = source
+        self.absent = absent
+        self.stats = stats
+
+    def is_absent(self, source: Any, key: str) -> bool:
+        if source is not self.source:
+            # e.g. a `get` on a value within the source
+            return False
+        slots = self.stats.slots()
+        if (res := self.absent.get(key)) is None:
+            slots[1] += 1
+            res = self.absent[key] = _is_absent(source, split_key(key))
+        else:
+            slots[0] += 1
+        if res:
+            slots[2] += 1
+        return res
+
+
+def _is_absent(source: dict[str, Any], key_list: list[str]) -> bool:
+    """
+    Returns whether `_nested_get(source, key_list, default)` gives `default` based only on the
+      keys at the top two levels of `source`
+    """
+    if not key_list or key_list[-1].endswith("[*]"):
+        return False
+    value: Any = source
+    for part in key_list[:2]:
+        if not isinstance(value, dict) or "[?" in part or "(" in part or "," in part:
+            return False
+        if part.endswith("]"):
+            match = REGEX_INDEX.fullmatch(part)
+            if match is None or not match.group(2).lstrip("-").isdigit():
+                return False
+            # An index into a list that is present depends on more than the keys
+            return match.group(1) not in value
+        if part in ("*", ".."):
+            return False
+        if part not in value:
+            return True
+        value = value[part]
+    return False
+
+
+class Table(list):
+    """
+    A list of rows (dicts) with a hash index per join key, for joins in `get`, e.g.
+      `get(sources, "observations[?subject.reference==encounter.subject.reference]")`.
+
+    Each index is built once (on the first join on that key), so wrap collections that are
+      shared between the sources of a batch to look up matching rows in O(1) instead of
+      scanning the list. The indexes aren't updated, so don't modify the rows after wrapping.
+
+    Tables can be shared between threads without locking. Two threads joining on a new key at
+      once each build the (same) index, and either one is kept.
+    """
+
+    def __init__(self, rows: Iterable[dict[str, Any]] = ()) -> None:
+        super().__init__(rows)
+        self._indexes: dict[str, dict[Any, list[int]]] = {}
+
+    def key_index(self, key: str) -> dict[Any, list[int]]:
+        """
+        Returns the index of key value -> positions of the rows with that value. A row with a
+          list value (e.g. `identifier[*].value`) is indexed under each of its values.
+        """
+        if (index := self._indexes.get(key)) is None:
+            index = {}
+            key_list = split_key(key)
+            for i, row in enumerate(self):
+                for v in _row_values(row, key_list):
+                    try:
+                        positions = index.setdefault(v, [])
+                    except TypeError:
+                        # Unhashable values can't be joined on
+                        continue
+                    # A row can have the same value more than once
+                    if not positions or positions[-1] != i:
+                        positions.append(i)
+            self._indexes[key] = index
+        return index
+
+    def lookup(self, key: str, values: Sequence[Any]) -> list[dict[str, Any]]:
+        """
+        Returns the rows where `key` matches any of `values`, in table order
+        """
+        index = self.key_index(key)
+        positions: list[int] = []
+        for v in values:
+            try:
+                positions.extend(index.get(v, ()))
+            except TypeError:
+                continue
+        if len(values) > 1:
+            positions = sorted(set(positions))
+        return [self[i] for i in positions]
+
+
+def _join(rows: Any, row_key: str, source_key: str, root: Any) -> list[dict[str, Any]]:
+    """
+    Returns the rows where `row_key` matches the value at `source_key` in `root` (or any of
+      them, if it's a list). `source_key` can also be a quoted literal.
+    """
+    if not rows or not isinstance(rows, list):
+        return []
+    if source_key[0] in "'\"" and source_key[-1] == source_key[0] and len(source_key) > 1:
+        wanted: Any = source_key[1:-1]
+    else:
+        wanted = _nested_get(root, split_key(source_key))
+    if wanted is None:
+        return []
+    values = wanted if isinstance(wanted, list) else [wanted]
+    if isinstance(rows, Table):
+        return rows.lookup(row_key, values)
+    key_list = split_key(row_key)
+    return [row for row in rows if any(v in values for v in _row_values(row, key_list))]
+
+
+def _row_values(row: Any, key_list: list[str]) -> list[Any]:
+    if not isinstance(row, dict):
+        return []
+    v = _nested_get(row, key_list)
+    if v is None:
+        return []
+    return [x for x in v if x is not None] if isinstance(v, list) else [v]
+
+
 def _nested_set(
-    source: dict[str, Any], tokenized_key_list: Sequence[str | int], target: Any
+    source: dict[str, Any],
+    tokenized_key_list: Sequence[str | int],
+    target: Any,
+    borrowed: set[int] | None = None,
 ) -> dict[str, Any] | None:
     """
     Returns a copy of source with the replace if successful, else None.
+
+    Containers in `borrowed` (by `id`), and anything within them, are not modified in-place.
+      Instead, the ones along the key path are shallow-copied first (copy-on-write).
     """
-    res: Any = source
     try:
-        for k in tokenized_key_list[:-1]:
-            res = res[k]
+        source, res = _writable_path(source, tokenized_key_list[:-1], borrowed)
         res[tokenized_key_list[-1]] = target
     except IndexError:
         return None
     return source
 
 
+def _writable_path(
+    source: dict[str, Any],
+    tokenized_key_list: Sequence[str | int],
+    borrowed: set[int] | None = None,
+) -> tuple[dict[str, Any], Any]:
+    """
+    Returns `source` and the container at the key path, with borrowed containers along the way
+      copied (see `_nested_set`). Raises an `IndexError` (or `KeyError`) if the path is missing.
+    """
+    if borrowed and id(source) in borrowed:
+        source = _copy_borrowed(source, borrowed)
+    res: Any = source
+    for k in tokenized_key_list:
+        parent, res = res, res[k]
+        if borrowed and id(res) in borrowed:
+            res = _copy_borrowed(res, borrowed)
+            parent[k] = res
+    return source, res
+
+
+def _copy_borrowed(obj: Any, borrowed: set[int]) -> Any:
+    """
+    Returns a shallow copy of a borrowed container. The containers within it are still borrowed,
+      so they're added to `borrowed` (later writes may reach them through the copy).
+    """
+    values = obj.values() if isinstance(obj, dict) else obj
+    borrowed.update(id(v) for v in values if isinstance(v, (dict, list)))
+    return obj.copy()
+
+
 def _get_tokenized_keypath(key: str) -> tuple[str | int, ...]:
     """
     Returns a keypath with str and ints separated. Prefer tuples so it is hashable.
@@ -159,16 +608,22 @@ def _get_tokenized_keypath(key: str) -> tuple[str | int, ...]:
     return tuple(int(k) if k.removeprefix("-").isnumeric() else k for k in keypath)
 
 
-def drop_keys(source: dict[str, Any], keys_to_drop: Iterable[str]) -> dict[str, Any]:
+def drop_keys(
+    source: dict[str, Any],
+    keys_to_drop: Iterable[str],
+    borrowed: set[int] | None = None,
+) -> dict[str, Any]:
     """
     Returns the dictionary with the requested keys set to `None`.
 
     If a key is a duplicate, then lookup fails so that key is skipped.
 
     DROP values are checked and handled here.
+
+    Containers in `borrowed` (see `borrowed_ids`) are copied instead of modified.
     """
     res = source
-    seen_keys = set()
+    seen_keys: set[tuple[str | int, ...]] = set()
     for key in keys_to_drop:
         curr_keypath = _get_tokenized_keypath(key)
         if curr_keypath not in seen_keys:
@@ -182,7 +637,7 @@ def drop_keys(source: dict[str, Any], keys_to_drop: Iterable[str]) -> dict[str,
                     # Handle case for dropping entire object
                     if len(curr_keypath) == 0:
                         return dict()
-                if updated := _nested_set(res, curr_keypath, None):
+                if updated := _nested_set(res, curr_keypath, None, borrowed):
                     res = updated
                 seen_keys.add(curr_keypath)
         else:
@@ -190,16 +645,44 @@ def drop_keys(source: dict[str, Any], keys_to_drop: Iterable[str]) -> dict[str,
     return res
 
 
-def impute_enum_values(source: dict[str, Any], keys_to_impute: set[str]) -> dict[str, Any]:
+def impute_enum_values(
+    source: dict[str, Any],
+    keys_to_impute: set[str],
+    borrowed: set[int] | None = None,
+) -> dict[str, Any]:
     """
     Returns the dictionary with the Enum values set to their corresponding `.value`
+
+    Containers in `borrowed` (see `borrowed_ids`) are copied instead of modified.
     """
     res = source
     for key in keys_to_impute:
         curr_val = _nested_get(res, key.split("."))
         if isinstance(curr_val, KEEP):
             literal_val = curr_val.value
-            res = _nested_set(res, _get_tokenized_keypath(key), literal_val)  # type: ignore
+            res = _nested_set(  # type: ignore
+                res, _get_tokenized_keypath(key), literal_val, borrowed
+            )
+    return res
+
+
+def borrowed_ids(borrowed: Iterable[Any]) -> set[int]:
+    """
+    Returns the ids of the containers borrowed from a source, given the values returned by `get`.
+
+    Lists and tuples returned by `get` may be new (e.g. from `[*]`) while holding borrowed items,
+      so their items are included too. Anything within a borrowed dict is borrowed as well,
+      which `_nested_set` accounts for, so dicts aren't traversed.
+    """
+    res: set[int] = set()
+    stack = list(borrowed)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in res:
+            continue
+        res.add(id(obj))
+        if isinstance(obj, (list, tuple)):
+            stack.extend(v for v in obj if isinstance(v, (dict, list, tuple)))
     return res
 
 
@@ -217,3 +700,119 @@ def _handle_ending_star_unwrap(res: T) -> T | list[Any]:
         if res_without_nones := [l for l in res if (l is not None) and (isinstance(l, list))]:
             return list(chain.from_iterable(res_without_nones))
     return res
+
+
+class _TrieNode:
+    __slots__ = ("children", "value", "is_leaf")
+
+    def __init__(self) -> None:
+        self.children: dict[str | int, _TrieNode] = {}
+        self.value: Any = None
+        self.is_leaf = False
+
+
+def build(values: dict[str, Any]) -> dict[str, Any]:
+    """
+    Builds a nested dict from flat key paths using the `get` syntax for keys, e.g.:
+        {"a.b[0].c": 1, "a.b[1].c": 2, "d": 3} -> {"a": {"b": [{"c": 1}, {"c": 2}]}, "d": 3}
+
+    Only `.` and (non-negative) list indices are supported, so `get` finds each value.
+
+    The key paths are first grouped into a prefix trie, so each intermediate dict or list is
+      created once (lists are pre-sized to their largest index). Unset list items are `None`.
+    """
+    root = _TrieNode()
+    for key, value in values.items():
+        node = root
+        for k in _get_writable_keypath(key):
+            if node.is_leaf:
+                raise ValueError(
+                    f"Key path {key} conflicts with a value set at one of its prefixes"
+                )
+            if (child := node.children.get(k)) is None:
+                child = node.children[k] = _TrieNode()
+            node = child
+        if node.children:
+            raise ValueError(f"Key path {key} conflicts with a value set under it")
+        node.value = value
+        node.is_leaf = True
+    return _build_from_trie(root, "")
+
+
+def _build_from_trie(node: _TrieNode, key: str) -> Any:
+    if node.is_leaf:
+        return node.value
+    if all(isinstance(k, str) for k in node.children):
+        return {k: _build_from_trie(child, f"{key}.{k}") for k, child in node.children.items()}
+    if not all(isinstance(k, int) for k in node.children):
+        raise ValueError(f"Got both list indices and dict keys under: {key}")
+    res: list[Any] = [None] * (max(node.children) + 1)  # type: ignore
+    for i, child in node.children.items():
+        res[i] = _build_from_trie(child, f"{key}[{i}]")  # type: ignore
+    return res
+
+
+def set_path(target: dict[str, Any], key: str, value: Any) -> dict[str, Any]:
+    """
+    Sets `value` at `key` (using the `get` syntax) within `target`, and returns `target`.
+
+    Missing (or `None`) intermediate values are created as dicts or lists depending on the next
+      part of the key. Lists are extended with `None` up to the index being set.
+
+    Raises a `ValueError` if a part of the key doesn't match the existing value, e.g. a list
+      index into a dict, or isn't supported (only `.` and non-negative list indices are).
+    """
+    keypath = _get_writable_keypath(key)
+    res: Any = target
+    for k, next_k in zip(keypath, keypath[1:]):
+        _check_writable(res, k, key)
+        if isinstance(res, list):
+            if k >= len(res):  # type: ignore
+                res.extend([None] * (k + 1 - len(res)))  # type: ignore
+            child = res[k]  # type: ignore
+        else:
+            child = res.get(k)
+        if child is None:
+            child = [] if isinstance(next_k, int) else dict()
+            res[k] = child
+        res = child
+    last_k = keypath[-1]
+    _check_writable(res, last_k, key)
+    if isinstance(res, list) and last_k >= len(res):  # type: ignore
+        res.extend([None] * (last_k + 1 - len(res)))  # type: ignore
+    res[last_k] = value
+    return target
+
+
+def _check_writable(res: Any, k: str | int, key: str) -> None:
+    if isinstance(res, dict) and isinstance(k, str):
+        return
+    if isinstance(res, list) and isinstance(k, int):
+        return
+    part = f"[{k}]" if isinstance(k, int) else k
+    raise ValueError(f"Cannot set `{part}` of a {type(res).__name__} value, in key path: {key}")
+
+
+def _get_writable_keypath(key: str) -> tuple[str | int, ...]:
+    """
+    Same as `_get_tokenized_keypath`, though only allows keys that point to a single location:
+      `.`-separated dict keys, each optionally followed by a `[n]` list index. Other parts
+      (e.g. `1` in `a.1`) are dict keys, same as in `get`.
+
+    Raises a `ValueError` for anything else, e.g. `[*]`, `[?...]`, `..` or a negative index.
+    """
+    if any(c in key for c in "*(:"):
+        raise ValueError(f"Only `.` and list indices are supported when setting keys, got: {key}")
+    keypath: list[str | int] = []
+    for part in key.split("."):
+        if (match := REGEX_WRITABLE_PART.fullmatch(part)) is None:
+            raise ValueError(
+                f"Only `.` and list indices are supported when setting keys, got: {key}"
+            )
+        k, index = match.groups()
+        keypath.append(k)
+        if index is not None:
+            if index.startswith("-"):
+                raise ValueError(f"Negative indices are not supported when setting keys: {key}")
+            keypath.append(int(index))
+    return tuple(keypath)
@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Iterable
+
+from .dicts import GetCache
+from .lib.context import MappingContext, in_copied_context, reset_context, set_context
+from .mapper import Mapper
+
+
+class MapperGroup:
+    """
+    Runs several `Mapper`s on the same source(s), e.g. one per downstream consumer, returning
+      all of their results in one call.
+
+    The mappers share one cache of `get` lookups (see `pydian.dicts.GetCache`), so each key path
+      (including `[*]` unwraps and joins) is only resolved once per source, regardless of how
+      many mappers use it. `only_if` and `apply` still run for each `get` call.
+
+    Set `max_workers` to run the mappers concurrently in a thread pool. This helps when the
+      mappers wait on I/O (e.g. a `BatchLoader` lookup), or on a free-threaded Python build.
+    """
+
+    def __init__(self, mappers: dict[str, Mapper], max_workers: int | None = None) -> None:
+        if not mappers:
+            raise ValueError("Expected at least one mapper")
+        self.mappers = mappers
+        self.max_workers = max_workers
+        # Cache from the latest call, e.g. to check its `hits` and `misses`
+        self.cache: GetCache | None = None
+
+    def __call__(self, source: dict[str, Any], **kwargs: Any) -> dict[str, dict[str, Any]]:
+        """
+        Maps `source` with each mapper, returning the results by mapper name
+        """
+        return self.map_many((source,), **kwargs)[0]
+
+    def map_many(
+        self, sources: Iterable[dict[str, Any]], **kwargs: Any
+    ) -> list[dict[str, dict[str, Any]]]:
+        """
+        Maps each source with each mapper (calling `map_many` once per mapper, so batched
+          lookups are still batched), returning the results by mapper name for each source.
+        """
+        sources = list(sources)
+        self.cache = GetCache()
+        # Mapper contexts created within this one share its cache
+        context = MappingContext()
+        context.get_cache = self.cache
+        token = set_context(context)
+        try:
+            if self.max_workers is None:
+                results = {
+                    name: mapper.map_many(sources, **kwargs)
+                    for name, mapper in self.mappers.items()
+                }
+            else:
+                with ThreadPoolExecutor(self.max_workers) as executor:
+                    futures = {
+                        name: executor.submit(
+                            in_copied_context(partial(mapper.map_many, sources, **kwargs))
+                        )
+                        for name, mapper in self.mappers.items()
+                    }
+                    results = {name: future.result() for name, future in futures.items()}
+        finally:
+            reset_context(token)
+        return [{name: results[name][i] for name in self.mappers} for i in range(len(sources))]
@@ -0,0 +1,102 @@
+import sys
+from typing import Any
+
+from .lib.counters import ThreadCounters
+
+
+class InternTable:
+    """
+    Bounded table of strings, used to share one copy of each repeated dict key and short string
+      value (e.g. `"http://loinc.org"`, `"final"`) between mapped results.
+
+    Pass one to a `Mapper` (`intern=...`) to intern its results. This is useful when keeping
+      many results in memory, e.g. before a bulk write.
+
+    Strings longer than `max_length` aren't interned. Once the table holds `max_size` strings,
+      new ones are no longer added, though existing ones are still shared.
+
+    `bytes_saved` counts the size of the duplicate strings replaced with an interned copy
+      (which are freed unless something else references them).
+
+    A table can be shared between threads: lookups and inserts are single (atomic) dict
+      operations, and the stats are counted per thread.
+    """
+
+    def __init__(self, max_size: int = 100_000, max_length: int = 64) -> None:
+        self.max_size = max_size
+        self.max_length = max_length
+        self._table: dict[str, str] = {}
+        self._stats = ThreadCounters("hits", "misses", "bytes_saved")
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    @property
+    def hits(self) -> int:
+        return self._stats["hits"]
+
+    @property
+    def misses(self) -> int:
+        return self._stats["misses"]
+
+    @property
+    def bytes_saved(self) -> int:
+        return self._stats["bytes_saved"]
+
+    def intern(self, s: str) -> str:
+        """
+        Returns the interned copy of `s` (if any), otherwise adds `s` to the table if there's room
+        """
+        return self._intern(s, self._stats.slots())
+
+    def _intern(self, s: str, stats: list[int]) -> str:
+        if len(s) > self.max_length:
+            return s
+        existing = self._table.get(s)
+        if existing is None:
+            stats[1] += 1
+            if len(self._table) >= self.max_size:
+                return s
+            # Another thread may have added an equal string since the lookup
+            existing = self._table.setdefault(s, s)
+            if existing is s:
+                return s
+        else:
+            stats[0] += 1
+        if existing is not s:
+            stats[2] += sys.getsizeof(s)
+        return existing
+
+    def intern_results(self, results: list[Any]) -> list[Any]:
+        """
+        Returns copies of `results` with their dict keys and string values interned.
+
+        Containers are copied rather than modified (since they may be borrowed from a source).
+          Containers shared between results stay shared.
+        """
+        memo: dict[int, Any] = {}
+        stats = self._stats.slots()
+        return [self._intern_obj(res, memo, stats) for res in results]
+
+    def clear(self) -> None:
+        self._table.clear()
+
+    def _intern_obj(self, obj: Any, memo: dict[int, Any], stats: list[int]) -> Any:
+        if isinstance(obj, str):
+            return self._intern(obj, stats)
+        if not isinstance(obj, (dict, list)):
+            return obj
+        if (copied := memo.get(id(obj))) is not None:
+            return copied
+        res: dict[Any, Any] | list[Any]
+        if isinstance(obj, dict):
+            res = {
+                (self._intern(k, stats) if isinstance(k, str) else k): (
+                    self._intern_obj(v, memo, stats)
+                )
+                for k, v in obj.items()
+            }
+        else:
+            res = [self._intern_obj(v, memo, stats) for v in obj]
+        memo[id(obj)] = res
+        return res
@@ -0,0 +1,69 @@
+from contextvars import ContextVar, copy_context
+from typing import Any, Callable, TypeVar
+
+from .types import ApplyError, Deferred, ErrorPolicy
+
+T = TypeVar("T")
+
+
+class MappingContext:
+    """
+    State for the current `Mapper` call, which `get` reads from.
+
+    Stored in a `ContextVar` so concurrent calls (threads, tasks) each see their own.
+    """
+
+    __slots__ = (
+        "on_error",
+        "errors",
+        "deferred",
+        "borrowed",
+        "borrowed_ids",
+        "get_cache",
+        "shape",
+        "source_index",
+    )
+
+    def __init__(self, on_error: ErrorPolicy = "raise", errors: list[ApplyError] | None = None):
+        self.on_error = on_error
+        self.errors = errors if errors is not None else []
+        # Placeholders created during the call, to be resolved in bulk
+        self.deferred: list[Deferred] = []
+        # Containers returned by `get`, which may be references into the source
+        self.borrowed: list[Any] = []
+        self.borrowed_ids: set[int] | None = None
+        # Cache of `get` lookups (see `pydian.group.MapperGroup`), shared with nested contexts
+        parent = _CURRENT_CONTEXT.get()
+        self.get_cache: Any = parent.get_cache if parent is not None else None
+        # Absent key paths of the source being mapped (see `pydian.dicts.ShapeCache`)
+        self.shape: Any = None
+        # Position of the source being mapped within its batch
+        self.source_index: int | None = None
+
+
+_CURRENT_CONTEXT: ContextVar[MappingContext | None] = ContextVar(
+    "pydian_mapping_context", default=None
+)
+
+
+def current_context() -> MappingContext | None:
+    return _CURRENT_CONTEXT.get()
+
+
+def set_context(context: MappingContext | None) -> Any:
+    """
+    Sets the current context, returning a token for `reset_context`
+    """
+    return _CURRENT_CONTEXT.set(context)
+
+
+def reset_context(token: Any) -> None:
+    _CURRENT_CONTEXT.reset(token)
+
+
+def in_copied_context(fn: Callable[[], T]) -> Callable[[], T]:
+    """
+    Returns `fn` to run in a copy of the current context (e.g. in a worker thread)
+    """
+    context = copy_context()
+    return lambda: context.run(fn)
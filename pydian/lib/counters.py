@@ -0,0 +1,72 @@
+import threading
+import weakref
+from typing import Any
+
+
+class ThreadCounters:
+    """
+    Named counters (e.g. cache hits and misses) that each thread increments in its own slots,
+      summed when read. Counting from many threads then needs no lock, and no `+=` on a shared
+      attribute (which can lose updates on a free-threaded Python build).
+
+    When a thread exits, its counts are merged into a shared total and its slots are released,
+      so short-lived threads (e.g. one executor per `map_threaded` call) don't pile up.
+    """
+
+    def __init__(self, *names: str) -> None:
+        self.names = names
+        self._local = threading.local()
+        # Slots of the threads still running, by the id of their `_ThreadSlots`
+        self._live: dict[int, list[int]] = {}
+        # Counts of the threads that have exited
+        self._retired = [0] * len(names)
+        self._lock = threading.Lock()
+
+    def slots(self) -> list[int]:
+        """
+        Returns the calling thread's counts (in `names` order), to increment in place
+        """
+        try:
+            return self._local.holder.slots
+        except AttributeError:
+            holder = self._local.holder = _ThreadSlots(len(self.names))
+            with self._lock:
+                self._live[id(holder)] = holder.slots
+            # The thread-local holder is released when its thread exits
+            weakref.finalize(holder, _retire, self._lock, self._live, self._retired, id(holder))
+            return holder.slots
+
+    def __getitem__(self, name: str) -> int:
+        i = self.names.index(name)
+        with self._lock:
+            return self._retired[i] + sum(slots[i] for slots in self._live.values())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._retired[:] = [0] * len(self.names)
+            for slots in self._live.values():
+                slots[:] = [0] * len(self.names)
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {"names": self.names, "totals": [self[name] for name in self.names]}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__init__(*state["names"])  # type: ignore[misc]
+        self._retired[:] = state["totals"]
+
+
+class _ThreadSlots:
+    __slots__ = ("slots", "__weakref__")
+
+    def __init__(self, n: int) -> None:
+        self.slots = [0] * n
+
+
+def _retire(lock: threading.Lock, live: dict[int, list[int]], retired: list[int], key: int) -> None:
+    """
+    Merges an exited thread's counts into `retired`. Doesn't reference the `ThreadCounters`, so
+      that pending finalizers don't keep it alive.
+    """
+    with lock:
+        slots = live.pop(key)
+        retired[:] = [total + n for total, n in zip(retired, slots)]
@@ -0,0 +1,106 @@
+import json
+from collections.abc import Collection
+from json.encoder import encode_basestring_ascii  # type: ignore[attr-defined]
+from typing import Any
+
+from .types import DROP, KEEP
+
+# For values without a fast path (e.g. tuples), matching `json.dumps` defaults
+_ENCODER = json.JSONEncoder()
+
+
+def encode_result(res: dict[str, Any], remove_empty: bool = True) -> str:
+    """
+    Returns the JSON for a mapping result with its DROP objects, empty values and KEEP objects
+      handled in the same pass, i.e. `json.dumps` of the post-processed result.
+    """
+    return finish_encoding(encode_value(res, remove_empty))
+
+
+def finish_encoding(fragment: str | int | None) -> str:
+    """
+    Returns the JSON for an encoded root dict (see `encode_value`)
+    """
+    if isinstance(fragment, int):
+        # Dropping the root itself gives `None`, so any level left goes past it
+        raise RuntimeError("Error: DROP level is invalid, as it goes past the root")
+    if fragment is None or fragment == "null":
+        return "{}"
+    return fragment
+
+
+def encode_value(obj: Any, remove_empty: bool = True) -> str | int | None:
+    """
+    Returns one of:
+     - The JSON fragment for `obj` after post-processing
+     - `None` if `obj` is removed as an empty value
+     - An `int` if `obj` is (or contains) a DROP object: the container holding `obj` is dropped,
+       as well as that many containers above it
+    """
+    t = type(obj)
+    if t is str:
+        return encode_basestring_ascii(obj) if obj or not remove_empty else None
+    if obj is None:
+        return None if remove_empty else "null"
+    if t is dict or (t is not list and isinstance(obj, dict)):
+        return _encode_items(obj.items(), remove_empty, "{", "}")
+    if t is list or isinstance(obj, list):
+        return _encode_items(enumerate(obj), remove_empty, "[", "]")
+    if t is int:
+        return int.__repr__(obj)
+    if t is bool:
+        return "true" if obj else "false"
+    if t is float:
+        return _encode_float(obj)
+    if isinstance(obj, DROP):
+        return -obj.value - 1
+    if isinstance(obj, KEEP):
+        # Imputed after removing empty values, so written as-is
+        return _ENCODER.encode(obj.value)
+    if remove_empty and isinstance(obj, Collection) and len(obj) == 0:
+        return None
+    return _ENCODER.encode(obj)
+
+
+def _encode_items(items: Any, remove_empty: bool, start: str, end: str) -> str | int | None:
+    is_dict = start == "{"
+    parts: list[str] = []
+    for k, v in items:
+        fragment = encode_value(v, remove_empty)
+        if fragment.__class__ is str:
+            parts.append(f"{_encode_key(k)}: {fragment}" if is_dict else fragment)  # type: ignore
+        elif fragment is not None:
+            # This container is dropped, and maybe more above it
+            if fragment:
+                return fragment - 1  # type: ignore
+            return None if remove_empty else "null"
+    if not parts:
+        return None if remove_empty else start + end
+    return start + ", ".join(parts) + end
+
+
+def _encode_key(k: Any) -> str:
+    if isinstance(k, str):
+        return encode_basestring_ascii(k)
+    # Same conversions as `json.dumps`
+    if k is True:
+        return '"true"'
+    if k is False:
+        return '"false"'
+    if k is None:
+        return '"null"'
+    if isinstance(k, int):
+        return f'"{int.__repr__(k)}"'
+    if isinstance(k, float):
+        return f'"{_encode_float(k)}"'
+    raise TypeError(f"keys must be str, int, float, bool or None, not {k.__class__.__name__}")
+
+
+def _encode_float(f: float) -> str:
+    if f != f:
+        return "NaN"
+    if f == float("inf"):
+        return "Infinity"
+    if f == float("-inf"):
+        return "-Infinity"
+    return float.__repr__(f)
@@ -1,9 +1,11 @@
+import reprlib
 from enum import Enum
-from typing import Any, Callable, TypeAlias
+from typing import Any, Callable, Literal, TypeAlias
 
 ApplyFunc: TypeAlias = Callable[[Any], Any]
 ConditionalCheck: TypeAlias = Callable[[Any], bool]
 MappingFunc: TypeAlias = Callable[..., dict[str, Any]]
+ErrorPolicy: TypeAlias = Literal["raise", "collect", "default"]
 
 
 class DROP(Enum):
@@ -49,3 +51,66 @@ class KEEP:
 
     def __init__(self, v: Any):
         self.value = v
+
+
+class Deferred:
+    """
+    A placeholder for a value that is looked up in bulk later (see `pydian.loaders.BatchLoader`).
+
+    The `Mapper` resolves all placeholders of a call (or `map_many` batch) together, then
+      replaces each of them with its value before post-processing.
+    """
+
+    __slots__ = ("loader", "key", "apply", "path", "default", "drop_level", "index")
+
+    def __init__(self, loader: Any, key: Any) -> None:
+        self.loader = loader
+        self.key = key
+        # Set by `get` when the placeholder is returned within an `apply` chain
+        self.apply: tuple[ApplyFunc, ...] = ()
+        self.path = ""
+        self.default: Any = None
+        self.drop_level: DROP | None = None
+        # Position of the source that the placeholder was created for, see `ApplyError.index`
+        self.index: int | None = None
+
+    def __repr__(self) -> str:
+        return f"Deferred({self.key!r})"
+
+
+class ApplyError(RuntimeError):
+    """
+    Raised (or collected, see `Mapper(on_error=...)`) when an `apply` call fails within `get`.
+
+    The failing value is only rendered when the error is formatted, and is truncated then.
+
+    `index` is the position of the failing source within the `Mapper` batch (`0` for a single
+      call), or `None` outside of a `Mapper`.
+    """
+
+    def __init__(
+        self, key: str, fn: ApplyFunc, exception: Exception, value: Any, index: int | None = None
+    ) -> None:
+        # Only the key is kept in `args`, so the value isn't rendered by the default `repr`
+        super().__init__(key)
+        self.key = key
+        self.fn = fn
+        self.exception = exception
+        self.value = value
+        self.index = index
+
+    def __repr__(self) -> str:
+        return f"ApplyError({self.key!r}, {self.fn!r}, {self.exception!r}, index={self.index})"
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return ApplyError, (self.key, self.fn, self.exception, self.value, self.index)
+
+    def __str__(self) -> str:
+        return (
+            f"`apply` call {self.fn} failed for value: {_ERROR_REPR.repr(self.value)}"
+            f" at key: {self.key}, {self.exception}"
+        )
+
+
+_ERROR_REPR = reprlib.Repr()
+_ERROR_REPR.maxstring = _ERROR_REPR.maxother = 200
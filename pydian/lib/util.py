@@ -1,7 +1,7 @@
 import re
 from collections.abc import Collection
 from itertools import chain
-from typing import Any, TypeVar
+from typing import Any, Iterable, TypeVar
 
 DL = TypeVar("DL", dict[str, Any], list[Any])
 
@@ -64,8 +64,17 @@ def split_key(key: str) -> list[str]:
 
     Handles the tuple case, e.g.:
         "a.b.(c,d)" -> ["a", "b", "c,d"]
+
+    Handles the recursive descent case (also before a tuple), e.g.:
+        "..a.b" -> ["..", "a", "b"]
+        "..a.(b,c)" -> ["..", "a", "b,c"]
+
+    Handles the join case, e.g.:
+        "a[?b.c==d.e].f" -> ["a[?b.c==d.e]", "f"]
     """
     if "(" in key:
+        if "..(" in key or ").." in key:
+            raise ValueError(f"Expected a key name between `..` and a tuple, got: {key}")
         split_parts = re.split(REGEX_TUPLE_CASE_DELIM, key)
         # Remove beginning and trailing empty strings
         if split_parts:
@@ -76,7 +85,68 @@ def split_key(key: str) -> list[str]:
         # Remove spaces
         split_parts = [p.replace(" ", "") for p in split_parts]
         # Split into sublists
-        split_subparts = [p.split(".") if "," not in p else [p] for p in split_parts]
+        split_subparts = [_split_descent(p) if "," not in p else [p] for p in split_parts]
         return list(chain.from_iterable(split_subparts))
+    elif ".." in key:
+        return _split_descent(key)
     else:
+        return _split_dots(key)
+
+
+def _split_descent(key: str) -> list[str]:
+    """
+    Splits on `.` (see `_split_dots`), keeping recursive descent as its own part, e.g.:
+        "a..b.c" -> ["a", "..", "b", "c"]
+    """
+    res: list[str] = []
+    for i, part in enumerate(key.split("..")):
+        if i > 0:
+            res.append("..")
+        if part:
+            res.extend(_split_dots(part))
+    return res
+
+
+def _split_dots(key: str) -> list[str]:
+    """
+    Splits on `.`, though not within brackets (e.g. a join condition)
+    """
+    if "[?" not in key:
         return key.split(".")
+    res: list[str] = []
+    depth = start = 0
+    for i, c in enumerate(key):
+        if c == "[":
+            depth += 1
+        elif c == "]":
+            depth -= 1
+        elif c == "." and depth == 0:
+            res.append(key[start:i])
+            start = i + 1
+    res.append(key[start:])
+    return res
+
+
+def count_nodes(obj: Any) -> int:
+    """
+    Recursively counts the values in `obj`, including `obj` itself and any nested containers.
+    """
+    if isinstance(obj, dict):
+        return 1 + sum(count_nodes(v) for v in obj.values())
+    elif isinstance(obj, (list, tuple)):
+        return 1 + sum(count_nodes(v) for v in obj)
+    return 1
+
+
+def count_empty_values(obj: Any) -> int:
+    """
+    Counts the values that `remove_empty_values` removes from `obj`, including any nested ones.
+    """
+    values: Iterable[Any]
+    if isinstance(obj, dict):
+        values = obj.values()
+    elif isinstance(obj, list):
+        values = obj
+    else:
+        return 0
+    return sum(count_empty_values(v) if has_content(v) else count_nodes(v) for v in values)
@@ -0,0 +1,138 @@
+from typing import Any, Callable, Hashable, Iterable, Mapping, Sequence
+
+from .dicts import _apply_chain
+from .lib.context import current_context
+from .lib.counters import ThreadCounters
+from .lib.types import Deferred
+
+BulkLookupFunc = Callable[[list[Any]], Mapping[Any, Any] | Sequence[Any]]
+
+
+class BatchLoader:
+    """
+    Batches lookups (e.g. translating codes through a terminology table) into one bulk call.
+
+    `fn` takes a list of unique keys and returns either a mapping of key -> value, or a sequence
+      of values in the same order as the keys. Keys that are missing from the result load as `None`.
+
+    Use `load` as an `apply` function in `get`. Within a `Mapper` call (or `map_many` batch), each
+      `load` returns a `Deferred` placeholder, and all of them are resolved with one call to `fn`
+      before post-processing. Loaded values are cached on the loader across calls.
+
+    A loader can be shared between threads (e.g. `Mapper.map_threaded`). Keys missing from the
+      cache in two threads at once may be fetched by both.
+    """
+
+    def __init__(self, fn: BulkLookupFunc) -> None:
+        self.fn = fn
+        self.cache: dict[Any, Any] = {}
+        self._stats = ThreadCounters("calls")
+
+    @property
+    def calls(self) -> int:
+        """
+        Number of calls to `fn` so far
+        """
+        return self._stats["calls"]
+
+    def load(self, key: Hashable) -> Deferred:
+        deferred = Deferred(self, key)
+        if (context := current_context()) is not None:
+            deferred.index = context.source_index
+            context.deferred.append(deferred)
+        return deferred
+
+    def load_many(self, keys: Iterable[Hashable]) -> None:
+        """
+        Loads any uncached keys into the cache with a single call to `fn`
+        """
+        missing = [k for k in dict.fromkeys(keys) if k not in self.cache]
+        if not missing:
+            return
+        results = self.fn(missing)
+        self._stats.slots()[0] += 1
+        if isinstance(results, Mapping):
+            self.cache.update({k: results.get(k) for k in missing})
+        else:
+            if len(results) != len(missing):
+                raise ValueError(
+                    f"Expected {len(missing)} values from bulk lookup, got: {len(results)}"
+                )
+            self.cache.update(zip(missing, results))
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+
+def resolve_deferred(results: list[Any], deferred: Iterable[Deferred] | None = None) -> list[Any]:
+    """
+    Loads the keys of all `deferred` placeholders in bulk (one call per loader), then replaces
+      the placeholders within `results` with their values. Returns the updated results.
+
+    If `deferred` isn't passed, `results` is scanned for placeholders instead.
+
+    Containers holding a placeholder are updated in place (these are always created by the
+      mapping, never borrowed from the source). Tuples are rebuilt.
+    """
+    pending = list(deferred) if deferred is not None else _find_deferred(results)
+    while pending:
+        keys_by_loader: dict[int, tuple[BatchLoader, list[Any]]] = {}
+        for d in pending:
+            keys_by_loader.setdefault(id(d.loader), (d.loader, []))[1].append(d.key)
+        for loader, keys in keys_by_loader.values():
+            loader.load_many(keys)
+        # Loaded values can lead to more placeholders (e.g. chained loaders)
+        context = current_context()
+        start = len(context.deferred) if context is not None else 0
+        results = [_fill(r) for r in results]
+        if context is not None:
+            pending = context.deferred[start:]
+            del context.deferred[start:]
+        else:
+            pending = _find_deferred(results)
+    return results
+
+
+def _loaded_value(deferred: Deferred) -> Any:
+    """
+    Returns the loaded value for `deferred` with the rest of its `apply` chain handled
+    """
+    res = deferred.loader.cache.get(deferred.key)
+    if res is not None and deferred.apply:
+        res = _apply_chain(res, deferred.apply, deferred.path, deferred.default, deferred.index)
+    if isinstance(res, Deferred):
+        res.drop_level = deferred.drop_level
+    elif deferred.drop_level and res is None:
+        res = deferred.drop_level
+    return res
+
+
+def _fill(obj: Any) -> Any:
+    if isinstance(obj, Deferred):
+        return _loaded_value(obj)
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            if isinstance(v, (Deferred, dict, list, tuple)):
+                if (filled := _fill(v)) is not v:
+                    obj[k] = filled
+    elif isinstance(obj, list):
+        for i, v in enumerate(obj):
+            if isinstance(v, (Deferred, dict, list, tuple)):
+                if (filled := _fill(v)) is not v:
+                    obj[i] = filled
+    elif isinstance(obj, tuple):
+        filled_tuple = tuple(_fill(v) for v in obj)
+        if any(a is not b for a, b in zip(filled_tuple, obj)):
+            return filled_tuple
+    return obj
+
+
+def _find_deferred(obj: Any) -> list[Deferred]:
+    if isinstance(obj, Deferred):
+        return [obj]
+    values: Iterable[Any] = ()
+    if isinstance(obj, dict):
+        values = obj.values()
+    elif isinstance(obj, (list, tuple)):
+        values = obj
+    return [d for v in values for d in _find_deferred(v)]
@@ -1,29 +1,228 @@
-from typing import Any
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from time import perf_counter
+from typing import IO, Any, Callable, Iterable, Sequence
 
-from .dicts import drop_keys, impute_enum_values
-from .lib.types import DROP, KEEP, MappingFunc
-from .lib.util import get_keys_containing_class, remove_empty_values
+from .dicts import ShapeCache, borrowed_ids, drop_keys, impute_enum_values
+from .interning import InternTable
+from .lib.context import (
+    MappingContext,
+    current_context,
+    in_copied_context,
+    reset_context,
+    set_context,
+)
+from .lib.encoder import encode_result
+from .lib.types import DROP, KEEP, ApplyError, ErrorPolicy, MappingFunc
+from .lib.util import (
+    count_empty_values,
+    count_nodes,
+    get_keys_containing_class,
+    remove_empty_values,
+)
+from .loaders import resolve_deferred
+from .observers import MapperMetrics, Observer
+from .template import LazyResult, Template
 
 
 class Mapper:
     def __init__(
         self,
-        map_fn: MappingFunc,
+        map_fn: MappingFunc | dict[str, Any],
         remove_empty: bool = True,
+        observer: Observer | None = None,
+        on_error: ErrorPolicy = "raise",
+        intern: InternTable | bool = False,
+        shape_cache: ShapeCache | bool = False,
     ) -> None:
+        """
+        `map_fn` is either a mapping function or a template dict (see `pydian.template.Template`)
+
+        `observer` receives per-call metrics (see `pydian.observers`). No metrics are computed
+          when it is not set.
+
+        `on_error` sets what happens when an `apply` within `get` fails:
+         - "raise": raise the `ApplyError` (default)
+         - "collect": use the `get` default and append the `ApplyError` to `self.errors`. Its
+           `index` is the position of the failing source within the `map_many` batch. Errors
+           are kept across calls, so clear the list (`mapper.errors.clear()`) once handled
+         - "default": use the `get` default
+
+        `intern` shares repeated dict keys and short strings between results to save memory
+          (see `pydian.interning.InternTable`). Pass `True` for a table owned by this `Mapper`,
+          or a table to share between `Mapper`s.
+
+        `shape_cache` makes `get` calls return early on key paths known to be missing from
+          sources with the same top-level keys (see `pydian.dicts.ShapeCache`). Pass `True` for
+          a cache owned by this `Mapper`, or a cache to share between `Mapper`s.
+        """
+        if on_error not in ("raise", "collect", "default"):
+            raise ValueError(f"Invalid `on_error` value: {on_error}")
+        if isinstance(map_fn, dict):
+            map_fn = Template(map_fn, remove_empty=remove_empty)
         self.map_fn = map_fn
         self.remove_empty = remove_empty
+        self.observer = observer
+        self.on_error = on_error
+        self.errors: list[ApplyError] = []
+        self.intern_table: InternTable | None = None
+        if isinstance(intern, InternTable):
+            self.intern_table = intern
+        elif intern:
+            self.intern_table = InternTable()
+        self.shape_cache: ShapeCache | None = None
+        if isinstance(shape_cache, ShapeCache):
+            self.shape_cache = shape_cache
+        elif shape_cache:
+            self.shape_cache = ShapeCache()
 
     def __call__(self, source: dict[str, Any], **kwargs: Any) -> dict[str, Any]:
         """
         Calls `map_fn` and then performs postprocessing into the result dict.
         """
-        res = self.map_fn(source, **kwargs)
+        return self.map_many((source,), **kwargs)[0]
+
+    def map_many(self, sources: Iterable[dict[str, Any]], **kwargs: Any) -> list[dict[str, Any]]:
+        """
+        Maps each source, same as calling the `Mapper` on each of them.
+
+        `Deferred` values (see `pydian.loaders`) are resolved together for the whole batch,
+          right before post-processing.
+        """
+        return self._map_many(sources, kwargs)
+
+    def _map_many(
+        self, sources: Iterable[dict[str, Any]], kwargs: dict[str, Any], offset: int = 0
+    ) -> list[dict[str, Any]]:
+        """
+        Same as `map_many`, where the first source is at position `offset` within the batch
+          (for the `index` of collected errors)
+        """
+        context = MappingContext(self.on_error, self.errors)
+        token = set_context(context)
+        try:
+            if self.observer is None:
+                results = self._map_batch(sources, context, kwargs, offset=offset)
+                results = [self._postprocess(res) for res in results]
+            else:
+                all_metrics: list[MapperMetrics] = []
+                results = self._map_batch(sources, context, kwargs, all_metrics, offset)
+                results = [self._observed_postprocess(r, m) for r, m in zip(results, all_metrics)]
+        finally:
+            reset_context(token)
+        if self.intern_table is not None:
+            results = self.intern_table.intern_results(results)
+        return results
+
+    def map_threaded(
+        self, sources: Iterable[dict[str, Any]], max_workers: int | None = None, **kwargs: Any
+    ) -> list[dict[str, Any]]:
+        """
+        Same as `map_many`, with the sources split into one batch per worker thread
+          (`max_workers`, defaults to the CPU count). On a free-threaded Python build (e.g.
+          3.13t), this scales with the number of cores without pickling sources or results
+          between processes. With the GIL, it only helps when mapping waits on I/O.
+
+        `Deferred` values are resolved once per batch, so each `BatchLoader` makes up to
+          `max_workers` bulk calls.
+        """
+        return _map_threaded(self._map_many, sources, max_workers, kwargs)
+
+    def dumps(self, source: dict[str, Any], **kwargs: Any) -> str:
+        """
+        Maps `source` and returns the result as JSON, same as `json.dumps(self(source))`.
+
+        DROP objects, empty values and KEEP objects are handled while encoding, so the
+          post-processed result is never built. With an observer, this falls back to
+          post-processing as usual (to report metrics).
+        """
+        if self.observer is not None:
+            return json.dumps(self(source, **kwargs))
+        context = MappingContext(self.on_error, self.errors)
+        token = set_context(context)
+        try:
+            res = self._map_batch((source,), context, kwargs)[0]
+        finally:
+            reset_context(token)
+        if isinstance(self.map_fn, Template):
+            return self.map_fn.encode(res)
+        return encode_result(res, self.remove_empty)
+
+    def dump(self, source: dict[str, Any], fp: IO[Any], **kwargs: Any) -> None:
+        """
+        Same as `dumps`, writing to a file-like object (either text or binary)
+        """
+        data = self.dumps(source, **kwargs)
+        fp.write(data if isinstance(fp, io.TextIOBase) else data.encode())
+
+    def lazy(self, source: dict[str, Any]) -> LazyResult:
+        """
+        Returns a read-only mapping where each top-level field is only evaluated (and
+          post-processed) on first access, see `pydian.template.LazyResult`.
+
+        Only template mappers can be lazy, since their fields can be evaluated independently.
+          The observer, interning and shape cache aren't used for lazy results.
+        """
+        if not isinstance(self.map_fn, Template):
+            raise ValueError("Only a `Mapper` with a template dict can return lazy results")
+        return LazyResult(self.map_fn, source, self.on_error, self.errors)
+
+    def then(self, other: "Mapper | Pipeline") -> "Pipeline":
+        """
+        Returns a `Pipeline` that maps the result of this `Mapper` with `other`, same as
+          calling `other` on each result
+        """
+        return Pipeline([self]).then(other)
+
+    def _map_batch(
+        self,
+        sources: Iterable[dict[str, Any]],
+        context: MappingContext,
+        kwargs: dict[str, Any],
+        all_metrics: list[MapperMetrics] | None = None,
+        offset: int = 0,
+    ) -> list[dict[str, Any]]:
+        """
+        Calls `map_fn` on each source and resolves any `Deferred` values, without post-processing.
+
+        If `all_metrics` is passed, the metrics for each call are appended to it.
+        """
+        results: list[dict[str, Any]] = []
+        shape_cache = self.shape_cache
+        for index, source in enumerate(sources, offset):
+            context.source_index = index
+            if shape_cache is not None:
+                context.shape = shape_cache.shape(source)
+            if all_metrics is None:
+                results.append(self.map_fn(source, **kwargs))
+                continue
+            metrics = MapperMetrics(input_nodes=count_nodes(source))
+            start = perf_counter()
+            results.append(self.map_fn(source, **kwargs))
+            metrics.timings["map"] = perf_counter() - start
+            all_metrics.append(metrics)
+        context.shape = context.source_index = None
+
+        if context.deferred:
+            pending, context.deferred = context.deferred, []
+            results = resolve_deferred(results, pending)
+        return results
+
+    def _postprocess(self, res: dict[str, Any]) -> dict[str, Any]:
+        # Templates already know which parts of the result are static
+        if isinstance(self.map_fn, Template):
+            keys_to_drop = self.map_fn.keys_to_drop(res)
+            if keys_to_drop:
+                res = drop_keys(res, keys_to_drop, _borrowed_ids())
+            return self.map_fn.finalize(res)
 
         # Handle any DROP-flagged values
         keys_to_drop = get_keys_containing_class(res, DROP)
         if keys_to_drop:
-            res = drop_keys(res, keys_to_drop)
+            res = drop_keys(res, keys_to_drop, _borrowed_ids())
 
         # Remove empty values
         if self.remove_empty:
@@ -32,6 +231,144 @@ class Mapper:
         # Impute EMPTY values with corresponding value
         keys_to_impute = get_keys_containing_class(res, KEEP)
         if keys_to_impute:
-            res = impute_enum_values(res, keys_to_impute)
+            # Removing empty values already copies everything
+            borrowed = _borrowed_ids() if not self.remove_empty else None
+            res = impute_enum_values(res, keys_to_impute, borrowed)
 
         return res
+
+    def _observed_postprocess(self, res: dict[str, Any], metrics: MapperMetrics) -> dict[str, Any]:
+        """
+        Same as `_postprocess`, though timing each phase and reporting metrics to the observer.
+        """
+        assert self.observer is not None
+        timings = metrics.timings
+
+        start = perf_counter()
+        if isinstance(self.map_fn, Template):
+            keys_to_drop = self.map_fn.keys_to_drop(res)
+        else:
+            keys_to_drop = get_keys_containing_class(res, DROP)
+        if keys_to_drop:
+            res = drop_keys(res, keys_to_drop, _borrowed_ids())
+        timings["drop"] = perf_counter() - start
+        metrics.drops_applied = len(keys_to_drop)
+
+        if self.remove_empty:
+            metrics.empties_removed = count_empty_values(res)
+        if isinstance(self.map_fn, Template):
+            # Empty values and KEEP objects are handled in the same pass for templates
+            start = perf_counter()
+            res = self.map_fn.finalize(res)
+            timings["finalize"] = perf_counter() - start
+        else:
+            start = perf_counter()
+            if self.remove_empty:
+                res = remove_empty_values(res)
+            timings["remove_empty"] = perf_counter() - start
+
+            start = perf_counter()
+            keys_to_impute = get_keys_containing_class(res, KEEP)
+            if keys_to_impute:
+                borrowed = _borrowed_ids() if not self.remove_empty else None
+                res = impute_enum_values(res, keys_to_impute, borrowed)
+            timings["keep"] = perf_counter() - start
+
+        metrics.output_nodes = count_nodes(res)
+        self.observer.observe(metrics)
+        return res
+
+
+class Pipeline:
+    """
+    Chains `Mapper`s, where each stage maps the result of the previous one.
+
+    This is plain composition: each stage post-processes its own results (so with its
+      `remove_empty`), same as calling the mappers one after another, and at the same cost.
+      Stages share one record of borrowed containers, so a later stage copies (rather than
+      modifies) what came from the sources.
+
+    Each stage uses its own `on_error` policy. Observers aren't called within a `Pipeline`.
+    """
+
+    def __init__(self, stages: Sequence[Mapper]) -> None:
+        if not stages:
+            raise ValueError("Expected at least one stage")
+        self.stages = list(stages)
+
+    def then(self, other: "Mapper | Pipeline") -> "Pipeline":
+        other_stages = other.stages if isinstance(other, Pipeline) else [other]
+        return Pipeline([*self.stages, *other_stages])
+
+    def __call__(self, source: dict[str, Any], **kwargs: Any) -> dict[str, Any]:
+        """
+        Maps `source` through each stage. `kwargs` are passed to the first stage.
+        """
+        return self.map_many((source,), **kwargs)[0]
+
+    def map_many(self, sources: Iterable[dict[str, Any]], **kwargs: Any) -> list[dict[str, Any]]:
+        return self._map_many(sources, kwargs)
+
+    def _map_many(
+        self, sources: Iterable[dict[str, Any]], kwargs: dict[str, Any], offset: int = 0
+    ) -> list[dict[str, Any]]:
+        results: list[dict[str, Any]] = list(sources)
+        # Later stages can borrow from the original sources through the intermediate results
+        borrowed: list[Any] = []
+        for i, stage in enumerate(self.stages):
+            context = MappingContext(stage.on_error, stage.errors)
+            context.borrowed = borrowed
+            token = set_context(context)
+            try:
+                results = stage._map_batch(
+                    results, context, kwargs if i == 0 else {}, offset=offset
+                )
+                results = [stage._postprocess(res) for res in results]
+            finally:
+                reset_context(token)
+        if (intern_table := self.stages[-1].intern_table) is not None:
+            results = intern_table.intern_results(results)
+        return results
+
+    def map_threaded(
+        self, sources: Iterable[dict[str, Any]], max_workers: int | None = None, **kwargs: Any
+    ) -> list[dict[str, Any]]:
+        """
+        Same as `map_many`, in one batch per worker thread (see `Mapper.map_threaded`)
+        """
+        return _map_threaded(self._map_many, sources, max_workers, kwargs)
+
+
+def _map_threaded(
+    map_many: Callable[[list[dict[str, Any]], dict[str, Any], int], list[dict[str, Any]]],
+    sources: Iterable[dict[str, Any]],
+    max_workers: int | None,
+    kwargs: dict[str, Any],
+) -> list[dict[str, Any]]:
+    sources = list(sources)
+    workers = max(1, min(max_workers or os.cpu_count() or 1, len(sources)))
+    if workers == 1:
+        return map_many(sources, kwargs, 0)
+    # Contiguous batches, so the results are concatenated in order
+    size = -(-len(sources) // workers)
+    starts = range(0, len(sources), size)
+    with ThreadPoolExecutor(len(starts)) as executor:
+        # Each thread runs in its own copy of the caller's context (e.g. a `MapperGroup` cache)
+        futures = [
+            executor.submit(in_copied_context(partial(map_many, sources[i : i + size], kwargs, i)))
+            for i in starts
+        ]
+        return [res for future in futures for res in future.result()]
+
+
+def _borrowed_ids() -> set[int]:
+    """
+    Returns the ids of containers borrowed from the source(s) in the current call, computed once
+      (and only once post-processing needs to modify the result).
+    """
+    context = current_context()
+    if context is None:
+        return set()
+    if context.borrowed_ids is None:
+        context.borrowed_ids = borrowed_ids(context.borrowed)
+    return context.borrowed_ids
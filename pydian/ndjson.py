@@ -0,0 +1,166 @@
+import json
+import mmap
+import os
+from array import array
+from bisect import bisect_left
+from typing import Any, Iterator
+
+# Header for saved indexes: magic, then the size and modification time (in ns) of the indexed
+#   file, and the record count
+_INDEX_MAGIC = b"PYDNDJX2"
+_HEADER_SIZE = len(_INDEX_MAGIC) + 24
+
+
+class LineIndex:
+    """
+    Index of the record (i.e. non-empty line) offsets in an NDJSON file, for random access and
+      splitting the file between workers.
+
+    The file is memory-mapped, so the OS shares its pages between processes and records are
+      parsed straight from the mapping: only the bytes of a record are copied to parse it.
+      Offsets are kept in an `array` (8 bytes per record) and can be saved with `save`.
+
+    Typical use is to build (or `load`) the index once, then hand each worker a byte range from
+      `ranges`, which it reads with `iter_range` (or `read_range` if it only has the path).
+    """
+
+    def __init__(self, path: str, offsets: array | None = None) -> None:
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm: mmap.mmap | bytes = b""
+        try:
+            stat = os.fstat(self._file.fileno())
+            self.size = stat.st_size
+            self._mtime_ns = stat.st_mtime_ns
+            # Empty files can't be mapped
+            if self.size:
+                self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.offsets = offsets if offsets is not None else _scan_offsets(self._mm, 0, self.size)
+        except BaseException:
+            self.close()
+            raise
+
+    @classmethod
+    def load(cls, path: str, index_path: str) -> "LineIndex":
+        """
+        Opens `path` with offsets from a saved index. Raises a `ValueError` if the size or
+          modification time of the file doesn't match the index (e.g. the file has changed
+          since). A rewrite that keeps both isn't detected.
+        """
+        with open(index_path, "rb") as f:
+            header = f.read(_HEADER_SIZE)
+            if len(header) != _HEADER_SIZE or not header.startswith(_INDEX_MAGIC):
+                raise ValueError(f"Not a line index: {index_path}")
+            start = len(_INDEX_MAGIC)
+            size = int.from_bytes(header[start : start + 8], "little")
+            mtime_ns = int.from_bytes(header[start + 8 : start + 16], "little")
+            count = int.from_bytes(header[-8:], "little")
+            stat = os.stat(path)
+            if (size, mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+                raise ValueError(f"Line index {index_path} is out of date for {path}")
+            offsets = array("Q")
+            offsets.fromfile(f, count)
+        return cls(path, offsets)
+
+    def save(self, index_path: str) -> None:
+        with open(index_path, "wb") as f:
+            f.write(_INDEX_MAGIC)
+            f.write(self.size.to_bytes(8, "little"))
+            f.write(self._mtime_ns.to_bytes(8, "little"))
+            f.write(len(self.offsets).to_bytes(8, "little"))
+            self.offsets.tofile(f)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, n: int) -> Any:
+        return self.record(n)
+
+    def line(self, n: int) -> bytes:
+        """
+        Returns the raw bytes of record `n` (without the line ending)
+        """
+        start = self.offsets[n]
+        end = self._mm.find(b"\n", start)
+        return self._mm[start : end if end != -1 else self.size].rstrip(b"\r")
+
+    def record(self, n: int) -> Any:
+        """
+        Returns record `n` parsed, e.g. to replay a failed item
+        """
+        return json.loads(self.line(n))
+
+    def ranges(self, n: int) -> list[tuple[int, int]]:
+        """
+        Splits the file into (at most) `n` byte ranges of `(start, end)` on line boundaries,
+          each with about the same number of records.
+        """
+        if n < 1:
+            raise ValueError(f"Expected at least one range, got: {n}")
+        count = len(self.offsets)
+        bounds = sorted({count * i // n for i in range(n)})
+        starts = [self.offsets[i] for i in bounds if i < count]
+        return list(zip(starts, [*starts[1:], self.size]))
+
+    def range_records(self, start: int, end: int) -> tuple[int, int]:
+        """
+        Returns the record numbers `(first, stop)` within the byte range, e.g. to report which
+          records a worker failed on.
+        """
+        return bisect_left(self.offsets, start), bisect_left(self.offsets, end)
+
+    def iter_range(self, start: int = 0, end: int | None = None) -> Iterator[Any]:
+        """
+        Parses the records within the byte range (by default, the whole file)
+        """
+        first, stop = self.range_records(start, self.size if end is None else end)
+        for i in range(first, stop):
+            yield self.record(i)
+
+    def close(self) -> None:
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._file.close()
+
+    def __enter__(self) -> "LineIndex":
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self.close()
+
+
+def read_range(path: str, start: int, end: int) -> Iterator[Any]:
+    """
+    Parses the records of `path` within a byte range from `LineIndex.ranges`, without an index.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = min(end, size)
+            pos = start
+            while pos < end:
+                line_end = mm.find(b"\n", pos, end)
+                if line_end == -1:
+                    line_end = end
+                if line := mm[pos:line_end].rstrip(b"\r"):
+                    yield json.loads(line)
+                pos = line_end + 1
+
+
+def _scan_offsets(mm: mmap.mmap | bytes, start: int, end: int) -> array:
+    """
+    Returns the start offsets of the non-empty lines within `mm[start:end]`
+    """
+    offsets = array("Q")
+    pos = start
+    while pos < end:
+        line_end = mm.find(b"\n", pos, end)
+        if line_end == -1:
+            line_end = end
+        # Skip empty lines (including `\r\n` ones)
+        if line_end > pos and not (line_end == pos + 1 and mm[pos] == 0x0D):
+            offsets.append(pos)
+        pos = line_end + 1
+    return offsets
@@ -0,0 +1,139 @@
+import json
+import math
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass, field
+
+
+@dataclass
+class MapperMetrics:
+    """
+    Metrics for a single `Mapper` call.
+
+    `timings` maps each phase (`map`, `drop`, `remove_empty`, `keep`) to its duration in seconds.
+      Template mappers remove empty values and impute KEEP objects in one pass, timed as
+      `finalize` instead of `remove_empty` and `keep`.
+
+    `empties_removed` counts the values removed as empty (including any nested within them),
+      not counting static template values, which are pruned ahead of time.
+    """
+
+    timings: dict[str, float] = field(default_factory=dict)
+    input_nodes: int = 0
+    output_nodes: int = 0
+    drops_applied: int = 0
+    empties_removed: int = 0
+
+
+class Observer(ABC):
+    """
+    Receives the metrics of each `Mapper` call, e.g. `Mapper(map_fn, observer=HistogramObserver())`
+    """
+
+    @abstractmethod
+    def observe(self, metrics: MapperMetrics) -> None:
+        ...
+
+
+class Histogram:
+    """
+    Aggregates values into power-of-2 buckets, so memory stays constant regardless of call count.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        # Bucket exponent `e` holds values in `[2 ** (e - 1), 2 ** e)`. Zero goes into `None`
+        self.buckets: dict[int | None, int] = {}
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        bucket = math.frexp(value)[1] if value > 0 else None
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, pct: float) -> float:
+        """
+        Returns the upper bound of the bucket containing the `pct` percentile (clamped to `max`).
+        """
+        if self.count == 0:
+            return math.nan
+        threshold = self.count * pct / 100
+        seen = self.buckets.get(None, 0)
+        if seen >= threshold:
+            return 0.0
+        for e in sorted(k for k in self.buckets if k is not None):
+            seen += self.buckets[e]
+            if seen >= threshold:
+                return min(math.ldexp(1.0, e), self.max)
+        return self.max
+
+    def summary(self) -> dict[str, float]:
+        if self.count == 0:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean": self.total / self.count,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+        }
+
+
+class HistogramObserver(Observer):
+    """
+    Keeps in-memory histograms of every phase timing and count across calls.
+
+    Calls from several threads (e.g. `Mapper.map_threaded`) are recorded one at a time.
+    """
+
+    def __init__(self) -> None:
+        self.histograms: dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, metrics: MapperMetrics) -> None:
+        with self._lock:
+            for phase, duration in metrics.timings.items():
+                self._histogram(f"timings.{phase}").add(duration)
+            self._histogram("input_nodes").add(metrics.input_nodes)
+            self._histogram("output_nodes").add(metrics.output_nodes)
+            self._histogram("drops_applied").add(metrics.drops_applied)
+            self._histogram("empties_removed").add(metrics.empties_removed)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            return {name: h.summary() for name, h in self.histograms.items()}
+
+    def export(self, path: str) -> None:
+        """
+        Writes the current summary to `path` as JSON
+        """
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def _histogram(self, name: str) -> Histogram:
+        if (h := self.histograms.get(name)) is None:
+            h = self.histograms[name] = Histogram()
+        return h
+
+
+class FileExporter(Observer):
+    """
+    Appends the metrics of each call to `path` as a JSON line.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    def observe(self, metrics: MapperMetrics) -> None:
+        line = json.dumps(asdict(metrics)) + "\n"
+        # So lines from concurrent calls aren't interleaved
+        with self._lock, open(self.path, "a") as f:
+            f.write(line)
@@ -1,5 +1,6 @@
+import operator
 from functools import partial
-from itertools import islice
+from itertools import compress, islice, repeat
 from typing import Any, Callable, Container, Iterable, Reversible, TypeVar
 
 import pydian
@@ -45,27 +46,19 @@ def do(func: Callable, *args: Any, **kwargs: Any) -> ApplyFunc:
 
 
 def add(value: Any, before: bool = False) -> ApplyFunc:
-    if before:
-        return lambda v: value + v
-    return lambda v: v + value
+    return _ElementwiseOp(operator.add, value, before)
 
 
 def subtract(value: Any, before: bool = False) -> ApplyFunc:
-    if before:
-        return lambda v: value - v
-    return lambda v: v - value
+    return _ElementwiseOp(operator.sub, value, before)
 
 
 def multiply(value: Any, before: bool = False) -> ApplyFunc:
-    if before:
-        return lambda v: value * v
-    return lambda v: v * value
+    return _ElementwiseOp(operator.mul, value, before)
 
 
 def divide(value: Any, before: bool = False) -> ApplyFunc:
-    if before:
-        return lambda v: value / v
-    return lambda v: v / value
+    return _ElementwiseOp(operator.truediv, value, before)
 
 
 T = TypeVar("T", list[Any], tuple[Any])
@@ -88,23 +81,23 @@ def index(idx: int) -> ApplyFunc | Callable[[Reversible], Any]:
 
 
 def equals(value: Any) -> ConditionalCheck:
-    return lambda v: v == value
+    return _ElementwiseOp(operator.eq, value)
 
 
 def gt(value: Any) -> ConditionalCheck:
-    return lambda v: v > value
+    return _ElementwiseOp(operator.gt, value)
 
 
 def lt(value: Any) -> ConditionalCheck:
-    return lambda v: v < value
+    return _ElementwiseOp(operator.lt, value)
 
 
 def gte(value: Any) -> ConditionalCheck:
-    return lambda v: v >= value
+    return _ElementwiseOp(operator.ge, value)
 
 
 def lte(value: Any) -> ConditionalCheck:
-    return lambda v: v <= value
+    return _ElementwiseOp(operator.le, value)
 
 
 def equivalent(value: Any) -> ConditionalCheck:
@@ -120,7 +113,7 @@ def contained_in(container: Container) -> ConditionalCheck:
 
 
 def not_equal(value: Any) -> ConditionalCheck:
-    return lambda v: v != value
+    return _ElementwiseOp(operator.ne, value)
 
 
 def not_equivalent(value: Any) -> ConditionalCheck:
@@ -143,7 +136,11 @@ stdlib Wrappers
 def map_to_list(func: Callable) -> ApplyFunc | Callable[[Iterable], list[Any]]:
     """
     Partial wrapper for `map`, then casts to a list
+
+    Arithmetic and comparison partials (e.g. `multiply`, `gt`) run over the whole list at once.
     """
+    if isinstance(func, _ElementwiseOp):
+        return func.map_to_list
     _map_to_list: Callable = lambda fn, it: list(map(fn, it))
     return partial(_map_to_list, func)
 
@@ -151,6 +148,39 @@ def map_to_list(func: Callable) -> ApplyFunc | Callable[[Iterable], list[Any]]:
 def filter_to_list(func: Callable) -> ApplyFunc | Callable[[Iterable], list[Any]]:
     """
     Partial wrapper for `filter`, then casts to a list
+
+    Arithmetic and comparison partials (e.g. `gt`) run over the whole list at once.
     """
+    if isinstance(func, _ElementwiseOp):
+        return func.filter_to_list
     _filter_to_list: Callable = lambda fn, it: list(filter(fn, it))
     return partial(_filter_to_list, func)
+
+
+class _ElementwiseOp:
+    """
+    A partial for a binary operator with a fixed operand, i.e. `op(v, value)` (or
+      `op(value, v)` if `before` is set).
+
+    Unlike a lambda, it can be run over a whole list at once (see `map_to_list`) with the
+      operator passed straight to `map`, which avoids a Python function call per element.
+    """
+
+    __slots__ = ("op", "value", "before")
+
+    def __init__(self, op: Callable[[Any, Any], Any], value: Any, before: bool = False) -> None:
+        self.op = op
+        self.value = value
+        self.before = before
+
+    def __call__(self, v: Any) -> Any:
+        return self.op(self.value, v) if self.before else self.op(v, self.value)
+
+    def map_to_list(self, it: Iterable) -> list[Any]:
+        if self.before:
+            return list(map(self.op, repeat(self.value), it))
+        return list(map(self.op, it, repeat(self.value)))
+
+    def filter_to_list(self, it: Iterable) -> list[Any]:
+        items = it if isinstance(it, (list, tuple)) else list(it)
+        return list(compress(items, self.map_to_list(items)))
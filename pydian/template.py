@@ -0,0 +1,401 @@
+import json
+from functools import partial
+from typing import Any, Iterable, Iterator, Mapping
+
+from . import dicts
+from .dicts import borrowed_ids, drop_keys
+from .lib.context import MappingContext, reset_context, set_context
+from .lib.encoder import _encode_key, encode_value, finish_encoding
+from .lib.types import DROP, KEEP, ApplyError, ErrorPolicy
+from .lib.util import get_keys_containing_class, has_content, remove_empty_values
+from .loaders import resolve_deferred
+
+# Kinds of compiled template children
+_STATIC = 0
+_LEAF = 1
+_NODE = 2
+
+# Payload of static values that are removed as empty
+_EMPTY = object()
+
+
+class _Node:
+    """
+    A compiled dict or list from a template that contains at least one dynamic value.
+
+    Each child is a `(key, kind, payload, keypath)` tuple where:
+     - `_STATIC` children hold their precomputed value
+     - `_LEAF` children hold a `source -> value` callable
+     - `_NODE` children hold another `_Node`
+    """
+
+    __slots__ = ("is_list", "children", "static_json")
+
+    def __init__(self, is_list: bool, children: list[tuple[Any, int, Any, str]]) -> None:
+        self.is_list = is_list
+        self.children = children
+        # JSON for `_STATIC` children by key, encoded on first use (see `Template.encode`)
+        self.static_json: dict[Any, str] = {}
+
+
+class Template:
+    """
+    A mapping specified as data: a dict of literals with `source -> value` callables as leaves
+      (e.g. `pydian.partials.get(...)`).
+
+    The template is analyzed once. Subtrees without callables (or DROP values) are static:
+      they are pruned and KEEP-imputed ahead of time, then copied into each result. Only the
+      dynamic leaves are evaluated per record, and only the dynamic parts of the result are
+      checked during post-processing.
+    """
+
+    def __init__(self, template: dict[str, Any], remove_empty: bool = True) -> None:
+        if not isinstance(template, dict):
+            raise TypeError(f"Expected template to be a dict, got: {type(template)}")
+        self.template = template
+        self.remove_empty = remove_empty
+        kind, compiled = self._compile(template, "")
+        if kind is _STATIC:
+            compiled = compiled if compiled is not _EMPTY else dict()
+        self._kind = kind
+        self._root = compiled
+        # Top-level fields that might drop the entire result, see `LazyResult`
+        self._root_droppers = (
+            [key for key, kind, payload, _ in compiled.children if _may_drop_root(kind, payload, 1)]
+            if kind is _NODE
+            else []
+        )
+
+    def __call__(self, source: dict[str, Any]) -> dict[str, Any]:
+        """
+        Evaluates the dynamic leaves against `source`. The result still contains any DROP/KEEP
+          objects and empty values, same as a regular mapping function.
+        """
+        if self._kind is _STATIC:
+            return _copy_static(self._root)
+        return _evaluate(self._root, source)
+
+    def keys_to_drop(self, res: dict[str, Any]) -> set[str]:
+        """
+        Finds all keys where a DROP object is found, only checking the dynamic parts of the result.
+        """
+        keys: set[str] = set()
+        if self._kind is not _STATIC:
+            _collect_keys(self._root, res, DROP, keys)
+        return keys
+
+    def finalize(self, res: dict[str, Any]) -> dict[str, Any]:
+        """
+        Removes empty values (if set) and imputes KEEP values, only checking the dynamic parts
+          of the result. Static subtrees are already finalized.
+        """
+        if self._kind is _STATIC:
+            return res
+        finalized = _finalize_node(self._root, res, self.remove_empty)
+        return finalized if finalized is not None else dict()
+
+    def encode(self, res: dict[str, Any]) -> str:
+        """
+        Returns the JSON for a result from `__call__`, same as `json.dumps` after post-processing
+          (see `pydian.lib.encoder`). Static subtrees are only encoded once.
+        """
+        if self._kind is _STATIC:
+            return json.dumps(self._root)
+        return finish_encoding(_encode_node(self._root, res, self.remove_empty))
+
+    def _compile(self, obj: Any, keypath: str) -> tuple[int, Any]:
+        """
+        Returns the kind and payload for `obj`. Empty static values return an `_EMPTY` payload
+          when `remove_empty` is set so the caller can skip them.
+        """
+        if isinstance(obj, DROP):
+            return _LEAF, lambda _: obj
+        if callable(obj):
+            return _LEAF, obj
+        if isinstance(obj, (dict, list)):
+            is_list = isinstance(obj, list)
+            children: list[tuple[Any, int, Any, str]] = []
+            items: Iterable[tuple[Any, Any]] = (
+                enumerate(obj) if isinstance(obj, list) else obj.items()
+            )
+            for k, v in items:
+                # Keys for list items are positions in the evaluated (i.e. compiled) list
+                child_key = len(children) if is_list else k
+                if is_list:
+                    child_keypath = f"{keypath}[{child_key}]"
+                else:
+                    child_keypath = f"{keypath}.{k}" if keypath else str(k)
+                kind, payload = self._compile(v, child_keypath)
+                if kind is _STATIC and payload is _EMPTY:
+                    continue
+                children.append((child_key, kind, payload, child_keypath))
+            if any(kind is not _STATIC for _, kind, _, _ in children):
+                return _NODE, _Node(is_list, children)
+            obj = [c[2] for c in children] if is_list else {c[0]: c[2] for c in children}
+            # Children are already finalized, so only need to check if this is now empty
+            if self.remove_empty and not obj:
+                return _STATIC, _EMPTY
+            return _STATIC, obj
+        # Static scalar (or KEEP)
+        if self.remove_empty and not has_content(obj):
+            return _STATIC, _EMPTY
+        return _STATIC, _impute_keep(obj)
+
+
+def _evaluate(node: _Node, source: dict[str, Any]) -> Any:
+    if node.is_list:
+        return [_evaluate_child(kind, payload, source) for _, kind, payload, _ in node.children]
+    return {key: _evaluate_child(kind, payload, source) for key, kind, payload, _ in node.children}
+
+
+def _evaluate_child(kind: int, payload: Any, source: dict[str, Any]) -> Any:
+    if kind is _STATIC:
+        return _copy_static(payload)
+    elif kind is _LEAF:
+        return payload(source)
+    return _evaluate(payload, source)
+
+
+def _copy_static(obj: Any) -> Any:
+    """
+    Returns a copy of the dicts and lists within a static value, so each result has its own
+      containers. Static values are already finalized, so their copies aren't scanned.
+    """
+    if obj.__class__ is dict:
+        return {k: _copy_static(v) if v.__class__ in _CONTAINERS else v for k, v in obj.items()}
+    if obj.__class__ is list:
+        return [_copy_static(v) if v.__class__ in _CONTAINERS else v for v in obj]
+    return obj
+
+
+_CONTAINERS = (dict, list)
+
+
+def _collect_keys(node: _Node, value: Any, cls: type, res: set[str]) -> None:
+    """
+    Adds the keys of `cls` objects within the dynamic parts of `value` to `res`
+    """
+    for key, kind, payload, keypath in node.children:
+        if kind is _STATIC:
+            continue
+        v = value[key]
+        if kind is _NODE:
+            _collect_keys(payload, v, cls, res)
+        elif isinstance(v, cls):
+            res.add(keypath)
+        elif isinstance(v, dict):
+            res |= get_keys_containing_class(v, cls, keypath)
+        elif isinstance(v, list):
+            res |= get_keys_containing_class({keypath: v}, cls)
+
+
+def _finalize_node(node: _Node, value: Any, remove_empty: bool) -> Any:
+    """
+    Returns a finalized copy of the dynamic container `value`, or `None` if it ends up empty.
+    """
+    if value is None:
+        return None
+    finalized: list[tuple[Any, Any]] = []
+    for key, kind, payload, _ in node.children:
+        if node.is_list:
+            v = value[key]
+        elif key in value:
+            v = value[key]
+        else:
+            continue
+        if kind is _NODE:
+            v = _finalize_node(payload, v, remove_empty)
+            if v is None and remove_empty:
+                continue
+        elif kind is _LEAF:
+            if remove_empty:
+                if not has_content(v):
+                    continue
+                v = remove_empty_values(v)
+            v = _impute_keep(v)
+        finalized.append((key, v))
+    if remove_empty and not finalized:
+        return None
+    if node.is_list:
+        return [v for _, v in finalized]
+    return dict(finalized)
+
+
+def _encode_node(node: _Node, value: Any, remove_empty: bool) -> str | int | None:
+    """
+    Same as `encode_value` for a dynamic container, with static children encoded once
+    """
+    parts: list[str] = []
+    for key, kind, payload, _ in node.children:
+        fragment: str | int | None
+        if kind is _STATIC:
+            if (fragment := node.static_json.get(key)) is None:
+                fragment = node.static_json[key] = json.dumps(payload)
+        elif kind is _NODE:
+            fragment = _encode_node(payload, value[key], remove_empty)
+        else:
+            fragment = encode_value(value[key], remove_empty)
+        if fragment.__class__ is str:
+            part = fragment if node.is_list else f"{_encode_key(key)}: {fragment}"
+            parts.append(part)  # type: ignore
+        elif fragment is not None:
+            # This container is dropped, and maybe more above it
+            if fragment:
+                return fragment - 1  # type: ignore
+            return None if remove_empty else "null"
+    if not parts:
+        return None if remove_empty else ("[]" if node.is_list else "{}")
+    if node.is_list:
+        return "[" + ", ".join(parts) + "]"
+    return "{" + ", ".join(parts) + "}"
+
+
+def _impute_keep(obj: Any) -> Any:
+    """
+    Returns `obj` with any KEEP objects replaced with their value. Containers are only copied
+      when they contain a KEEP object.
+    """
+    if isinstance(obj, KEEP):
+        return obj.value
+    if isinstance(obj, dict):
+        imputed_dict = {k: _impute_keep(v) for k, v in obj.items()}
+        if any(imputed_dict[k] is not v for k, v in obj.items()):
+            return imputed_dict
+    elif isinstance(obj, list):
+        imputed_list = [_impute_keep(v) for v in obj]
+        if any(a is not b for a, b in zip(imputed_list, obj)):
+            return imputed_list
+    return obj
+
+
+# Markers for fields of a `LazyResult`
+_ABSENT = object()
+_ROOT_DROPPED = object()
+
+
+class LazyResult(Mapping[str, Any]):
+    """
+    A read-only mapping for the result of a `Template`, where each top-level field is evaluated
+      and post-processed on first access (then memoized). Use `materialize` for the full dict.
+
+    Fields that end up empty or dropped are missing, same as in the full result. So iterating
+      (or `len`) evaluates every field. Fields that may drop the entire result (i.e. that
+      might have a DROP level reaching the root) are evaluated before any field is returned.
+
+    The source is kept until all fields are evaluated, so don't modify it in the meantime.
+    """
+
+    def __init__(
+        self,
+        template: Template,
+        source: dict[str, Any],
+        on_error: ErrorPolicy = "raise",
+        errors: list[ApplyError] | None = None,
+    ) -> None:
+        self._template = template
+        self._source: dict[str, Any] | None = source
+        self._on_error = on_error
+        self._errors = errors if errors is not None else []
+        if template._kind is _STATIC:
+            self._children = {k: (k, _STATIC, v, k) for k, v in template._root.items()}
+        else:
+            self._children = {c[0]: c for c in template._root.children}
+        self._values: dict[str, Any] = {}
+        self._dropped: bool | None = None
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._children or self._is_dropped():
+            raise KeyError(key)
+        if (v := self._field(key)) is _ABSENT:
+            raise KeyError(key)
+        return v
+
+    def __contains__(self, key: object) -> bool:
+        try:
+            self[key]  # type: ignore
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self) -> Iterator[str]:
+        if self._is_dropped():
+            return
+        for key in self._children:
+            if self._field(key) is not _ABSENT:
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"<LazyResult: {len(self._values)} of {len(self._children)} fields evaluated>"
+
+    def materialize(self) -> dict[str, Any]:
+        """
+        Evaluates any remaining fields, returning the full result (same as the `Mapper` result)
+        """
+        return {key: self._values[key] for key in self}
+
+    def _is_dropped(self) -> bool:
+        if self._dropped is None:
+            self._dropped = any(
+                self._field(key) is _ROOT_DROPPED for key in self._template._root_droppers
+            )
+        return self._dropped
+
+    def _field(self, key: str) -> Any:
+        if key in self._values:
+            return self._values[key]
+        child = self._children[key]
+        _, kind, payload, _ = child
+        if kind is _STATIC:
+            v = _copy_static(payload)
+        else:
+            v = self._evaluate(child)
+            if v is _ROOT_DROPPED:
+                self._dropped = True
+        self._values[key] = v
+        if len(self._values) == len(self._children):
+            self._source = None
+        return v
+
+    def _evaluate(self, child: tuple[Any, int, Any, str]) -> Any:
+        """
+        Evaluates and post-processes a single top-level field, same as `Mapper` does for the
+          full result
+        """
+        key, kind, payload, _ = child
+        context = MappingContext(self._on_error, self._errors)
+        token = set_context(context)
+        try:
+            value = {key: _evaluate_child(kind, payload, self._source)}  # type: ignore
+            if context.deferred:
+                pending, context.deferred = context.deferred, []
+                value = resolve_deferred([value], pending)[0]
+            node = _Node(False, [child])
+            keys_to_drop: set[str] = set()
+            _collect_keys(node, value, DROP, keys_to_drop)
+            if keys_to_drop:
+                value = drop_keys(value, keys_to_drop, borrowed_ids(context.borrowed))
+                if key not in value:
+                    return _ROOT_DROPPED
+        finally:
+            reset_context(token)
+        finalized = _finalize_node(node, value, self._template.remove_empty)
+        return finalized.get(key, _ABSENT) if finalized is not None else _ABSENT
+
+
+def _may_drop_root(kind: int, payload: Any, depth: int) -> bool:
+    """
+    Returns whether a compiled child at `depth` might drop the entire result.
+
+    Only `pydian.partials.get` leaves have a known DROP level, so other callables might.
+    """
+    if kind is _STATIC:
+        return False
+    if kind is _NODE:
+        return any(_may_drop_root(k, p, depth + 1) for _, k, p, _ in payload.children)
+    if isinstance(payload, partial) and payload.func is dicts.get:
+        drop_level = payload.keywords.get("drop_level")
+        return drop_level is not None and -drop_level.value >= depth
+    return True
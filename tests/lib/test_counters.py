@@ -0,0 +1,29 @@
+import pickle
+import threading
+
+from pydian.lib.counters import ThreadCounters
+
+
+def test_thread_counters() -> None:
+    counters = ThreadCounters("hits", "misses")
+
+    def count() -> None:
+        slots = counters.slots()
+        for _ in range(1000):
+            slots[0] += 1
+        counters.slots()[1] += 1
+
+    threads = [threading.Thread(target=count) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    count()
+    assert (counters["hits"], counters["misses"]) == (9000, 9)
+    # Exited threads are merged into the totals, leaving only this thread's slots
+    assert len(counters._live) == 1
+
+    restored = pickle.loads(pickle.dumps(counters))
+    assert (restored["hits"], restored["misses"]) == (9000, 9)
+    counters.clear()
+    assert (counters["hits"], counters["misses"]) == (0, 0)
@@ -33,3 +33,16 @@ def test_split_key() -> None:
         "e",
         "f.third,g.fourth",
     ]
+
+
+def test_split_key_recursive_descent() -> None:
+    assert split_key("..a") == ["..", "a"]
+    assert split_key("..a[*].b") == ["..", "a[*]", "b"]
+    assert split_key("a..b.c") == ["a", "..", "b", "c"]
+
+
+def test_split_key_join() -> None:
+    assert split_key("a[?b.c==d.e].f") == ["a[?b.c==d.e]", "f"]
+    assert split_key("x.a[?b == 'c.d'][*]") == ["x", "a[?b == 'c.d'][*]"]
+    assert split_key("..a[?b.c==d].e") == ["..", "a[?b.c==d]", "e"]
+    assert split_key("a[?b[*].c==d[*].e].f") == ["a[?b[*].c==d[*].e]", "f"]
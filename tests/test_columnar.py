@@ -0,0 +1,121 @@
+import csv
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+import pydian.columnar
+from pydian import Mapper
+from pydian.columnar import Columns, infer_schema, to_columns
+
+RESULTS: list[dict[str, Any]] = [
+    {"id": "a", "value": {"quantity": 1.5, "count": 1}, "codes": ["x", "y"], "active": True},
+    {"id": "b", "value": {"quantity": 2, "count": 2}, "active": False},
+    {"id": "c", "codes": ["z"]},
+]
+
+
+@pytest.fixture(params=["array", "numpy"])
+def backend(request: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch) -> str:
+    """
+    Runs a test with NumPy arrays (if installed) and with `array.array`s as column buffers
+    """
+    np = pytest.importorskip("numpy") if request.param == "numpy" else None
+    monkeypatch.setattr(pydian.columnar, "np", np)
+    return str(request.param)
+
+
+def test_infer_schema() -> None:
+    assert infer_schema(RESULTS) == {
+        "id": "object",
+        "value.quantity": "float",
+        "value.count": "int",
+        "codes[0]": "object",
+        "codes[1]": "object",
+        "active": "bool",
+    }
+    assert infer_schema(RESULTS, sample_size=1)["value.quantity"] == "float"
+
+
+def test_to_columns(backend: str) -> None:
+    columns = to_columns(RESULTS)
+    assert len(columns) == 3
+    assert columns.column("id") == ["a", "b", "c"]
+    assert columns.column("value.quantity") == [1.5, 2.0, None]
+    assert columns.column("value.count") == [1, 2, None]
+    assert columns.column("codes[1]") == ["y", None, None]
+    assert columns.column("active") == [True, False, None]
+    assert columns.nulls["value.count"] == bytearray([0, 0, 1])
+
+    # Explicit schema, including paths that aren't in the results
+    columns = to_columns(RESULTS, {"value.count": "float", "missing.path": "int"})
+    assert columns.column("value.count") == [1.0, 2.0, None]
+    assert columns.column("missing.path") == [None, None, None]
+
+    # Key paths only
+    columns = to_columns(RESULTS, ["codes[0]", "value.count"])
+    assert columns.schema == {"codes[0]": "object", "value.count": "int"}
+
+    with pytest.raises(ValueError):
+        to_columns(RESULTS, {"id": "int"})
+    with pytest.raises(ValueError):
+        to_columns(RESULTS, {"id": "str"})
+
+
+def test_to_csv(simple_data: dict[str, Any], tmp_path: Path) -> None:
+    mapper = Mapper(lambda m: {"id": m["patient"]["id"], "active": m["patient"]["active"]})
+    columns = to_columns(mapper.map_many(simple_data["list_data"]) + [{}])
+    path = tmp_path / "out.csv"
+    columns.to_csv(str(path))
+    with open(path, newline="") as f:
+        assert list(csv.reader(f)) == [
+            ["id", "active"],
+            ["abc123", "True"],
+            ["def456", "True"],
+            ["ghi789", "False"],
+            ["", ""],
+        ]
+
+
+def test_to_npy(backend: str, tmp_path: Path) -> None:
+    columns = to_columns(RESULTS)
+    columns.to_npy(str(tmp_path))
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "active.npy",
+        "active.nulls.npy",
+        "value.count.npy",
+        "value.count.nulls.npy",
+        "value.quantity.npy",
+        "value.quantity.nulls.npy",
+    ]
+    data = (tmp_path / "value.count.npy").read_bytes()
+    assert data.startswith(b"\x93NUMPY\x01\x00")
+    header_len = int.from_bytes(data[8:10], "little")
+    assert (10 + header_len) % 64 == 0
+    assert "'shape': (3,)" in data[10 : 10 + header_len].decode("latin1")
+    assert len(data) == 10 + header_len + 3 * 8
+
+    with pytest.raises(ValueError):
+        columns.to_npy(str(tmp_path), ["id"])
+
+
+def test_column_types(backend: str) -> None:
+    # Later values that don't fit the column type inferred from the sample
+    results: list[dict[str, Any]] = [{"x": i, "b": True, "big": 1} for i in range(150)]
+    results += [{"x": 2.5, "b": "abc", "big": 2**70}, {"b": 5}]
+    assert infer_schema(results) == {"x": "int", "b": "bool", "big": "int"}
+
+    columns = to_columns(results)
+    assert columns.schema == {"x": "float", "b": "object", "big": "float"}
+    assert columns.column("x")[-3:] == [149.0, 2.5, None]
+    assert columns.column("b")[-3:] == [True, "abc", 5]
+    assert columns.column("big")[-2] == float(2**70)
+    assert to_columns(results, ["x"]).schema == {"x": "float"}
+
+    # Explicit types are checked the same way for both backends
+    for schema in ({"x": "int"}, {"b": "bool"}, {"big": "int"}, {"x": "bool"}):
+        with pytest.raises(ValueError):
+            to_columns(results, schema)
+    with pytest.raises(ValueError):
+        Columns([{"b": 1}], {"b": "bool"})
+    assert Columns([{"b": 1}], {"b": "float"}).column("b") == [1.0]
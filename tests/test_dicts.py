@@ -1,8 +1,10 @@
 from typing import Any
 
+import pytest
+
 import pydian.partials as p
-from pydian import Mapper, get
-from pydian.dicts import drop_keys
+from pydian import DROP, IndexedSource, Mapper, Table, build, get
+from pydian.dicts import ShapeCache, drop_keys, set_path
 
 
 def test_get(simple_data: dict[str, Any]) -> None:
@@ -203,3 +205,233 @@ def test_get_nested_key_tuple(nested_data: dict[str, Any]) -> None:
     assert get(source, "data[*].patient.dicts[*].(num, inner.msg)") == [
         [(obj["num"], obj["inner"]["msg"]) for obj in d["patient"]["dicts"]] for d in source["data"]
     ]
+
+
+def test_build() -> None:
+    assert build({"a.b[0].c": 1, "a.b[1].c": 2, "a.d": "e", "f": [1]}) == {
+        "a": {"b": [{"c": 1}, {"c": 2}], "d": "e"},
+        "f": [1],
+    }
+    # Unset list items are `None`
+    assert build({"a[2]": "c", "a[0]": "a"}) == {"a": ["a", None, "c"]}
+    assert build({}) == {}
+
+    # Round-trip with `get`, where only `[n]` is a list index
+    paths = {
+        "data.patient.id": "abc123",
+        "data.patient.names[1].given[0]": "Alex",
+        "data.codes.1": "x",
+    }
+    res = build(paths)
+    for k, v in paths.items():
+        assert get(res, k) == v
+
+    with pytest.raises(ValueError):
+        build({"a": 1, "a.b": 2})
+    with pytest.raises(ValueError):
+        build({"a.b": 2, "a": 1})
+    with pytest.raises(ValueError):
+        build({"a[0]": 1, "a.b": 2})
+    assert build({"a.1": "x"}) == {"a": {"1": "x"}}
+    # Unsupported syntax
+    for bad_key in ("a[-1]", "a[*].b", "a..b", "obs[?x==y]", "a[0][1]", "a.", "a[x]"):
+        with pytest.raises(ValueError):
+            build({bad_key: 1})
+    # The result is always a dict
+    with pytest.raises(ValueError):
+        build({"[0].a": 1})
+
+
+def test_set_path() -> None:
+    target: dict[str, Any] = {"a": {"b": [{"c": 1}]}}
+    assert set_path(target, "a.b[0].c", 2) is target
+    assert target == {"a": {"b": [{"c": 2}]}}
+
+    set_path(target, "a.b[2].d[1]", 3)
+    set_path(target, "a.e", None)
+    set_path(target, "a.e.f", 4)
+    assert target == {"a": {"b": [{"c": 2}, None, {"d": [None, 3]}], "e": {"f": 4}}}
+
+    assert set_path({"a": {}}, "a.1", 2) == {"a": {"1": 2}}
+
+    for bad_key in ("a.b[*]", "a.b[-1]", "a..b", "a.b[?c==1]"):
+        with pytest.raises(ValueError):
+            set_path(target, bad_key, 1)
+    with pytest.raises(ValueError):
+        set_path({"a": []}, "a[-1]", 1)
+    # Parts of the key must match the existing values
+    for bad_key in ("a[0]", "a.b.c", "a.b[2].d.e", "a.e.f[0]", "a.e.f.g"):
+        with pytest.raises(ValueError):
+            set_path(target, bad_key, 5)
+    with pytest.raises(ValueError):
+        set_path({"a": {}}, "a[0]", 5)
+
+
+def test_get_recursive_descent() -> None:
+    source: dict[str, Any] = {
+        "resourceType": "Bundle",
+        "code": {"coding": [{"system": "a", "code": "1"}, {"system": "b", "code": "2"}]},
+        "entry": [
+            {"resource": {"code": {"coding": [{"code": "3"}]}}},
+            {"resource": {"extension": [{"valueCodeableConcept": {"coding": [{"code": "4"}]}}]}},
+            {"resource": {"coding": None}},
+        ],
+    }
+    expected_codes = ["1", "2", "3", "4"]
+    assert get(source, "..coding[*].code") == expected_codes
+    assert get(source, "..coding[0].code") == ["1", "3", "4"]
+    assert get(source, "..coding") == [
+        source["code"]["coding"],
+        [{"code": "3"}],
+        [{"code": "4"}],
+    ]
+    assert get(source, "entry..coding[*].code") == ["3", "4"]
+    assert get(source, "entry[1]..valueCodeableConcept.coding[0].code") == ["4"]
+    assert get(source, "..missing") is None
+    assert get(source, "..missing", default=[]) == []
+    assert get(source, "..coding[*].code", apply=len) == 4
+    # With a tuple after it
+    assert get(source, "..coding[*].(code,system)") == [
+        ("1", "a"),
+        ("2", "b"),
+        ("3", None),
+        ("4", None),
+    ]
+    with pytest.raises(ValueError):
+        get(source, "code..(coding,system)")
+
+    # Same results with an index
+    indexed_source = IndexedSource(source)
+    assert indexed_source == source
+    assert get(indexed_source, "..coding[*].code") == expected_codes
+    assert get(indexed_source, "..coding[0].code") == ["1", "3", "4"]
+    assert get(indexed_source, "..missing") is None
+    assert indexed_source.dicts_containing("code")[0] is indexed_source
+    assert indexed_source.dicts_containing("code")[1] is source["code"]["coding"][0]
+
+
+def test_get_dict_wildcard() -> None:
+    source = {
+        "meta": {
+            "first": {"id": "a", "tags": ["x"]},
+            "second": {"id": "b", "tags": ["y", "z"]},
+            "versionId": "1",
+        }
+    }
+    assert get(source, "meta.*.id") == ["a", "b", None]
+    assert get(source, "meta.*.tags[*]") == ["x", "y", "z"]
+    assert get(source, "meta.*") == list(source["meta"].values())
+    assert get(source["meta"], "*") == list(source["meta"].values())
+    assert get(source, "missing.*.id") is None
+    assert get(source, "meta.*.id", apply=p.filter_to_list(bool)) == ["a", "b"]
+
+
+def test_get_join() -> None:
+    observations: list[dict[str, Any]] = [
+        {"id": "o1", "subject": {"reference": "Patient/1"}, "status": "final", "value": 1},
+        {"id": "o2", "subject": {"reference": "Patient/2"}, "status": "final", "value": 2},
+        {"id": "o3", "subject": {"reference": "Patient/1"}, "status": "draft", "value": 3},
+        {"id": "o4", "value": 4},
+    ]
+    practitioners: list[dict[str, Any]] = [
+        {"id": "pr1", "identifier": [{"value": "a"}, {"value": "b"}, {"value": "a"}]},
+        {"id": "pr2", "identifier": [{"value": "c"}]},
+        {"id": "pr3"},
+    ]
+    for wrap in (list, Table):
+        sources = {
+            "encounter": {
+                "subject": {"reference": "Patient/1"},
+                "participant": [{"individual": "a"}, {"individual": "c"}, {"individual": "x"}],
+            },
+            "observations": wrap(observations),
+            "practitioners": wrap(practitioners),
+        }
+        # One-to-many
+        key = "observations[?subject.reference==encounter.subject.reference]"
+        assert get(sources, key) == [observations[0], observations[2]]
+        assert get(sources, f"{key}.id") == ["o1", "o3"]
+        assert get(sources, f"{key}.value", apply=sum) == 4
+        assert get(sources, "observations[?status=='final'].id") == ["o1", "o2"]
+        assert get(sources, 'observations[?status == "draft"].id') == ["o3"]
+        # Many-to-many, with rows matching on any of their values
+        key = "practitioners[?identifier[*].value==encounter.participant[*].individual].id"
+        assert get(sources, key) == ["pr1", "pr2"]
+        # No matches
+        assert get(sources, "observations[?subject.reference==encounter.missing]") == []
+        assert get(sources, "missing[?subject.reference==encounter.subject.reference]") == []
+        assert get(sources, "observations[?id=='none'].id") == []
+        assert get(sources, "observations[?id=='o1'].id[0]") == ["o"]
+
+    table = Table(observations)
+    assert table.key_index("subject.reference") == {"Patient/1": [0, 2], "Patient/2": [1]}
+    assert table.key_index("subject.reference") is table.key_index("subject.reference")
+    assert Table(practitioners).key_index("identifier[*].value") == {"a": [0], "b": [0], "c": [1]}
+
+    # Within a `Mapper`, the index is built once for the batch
+    encounters = [{"subject": {"reference": f"Patient/{i % 3}"}} for i in range(6)]
+    table = Table(observations)
+    mapper = Mapper(
+        {"values": p.get("observations[?subject.reference==encounter.subject.reference].value")}
+    )
+    results = mapper.map_many({"encounter": e, "observations": table} for e in encounters)
+    assert [r.get("values") for r in results] == [None, [1, 3], [2]] * 2
+    assert list(table._indexes) == ["subject.reference"]
+
+
+def test_shape_cache(simple_data: dict[str, Any]) -> None:
+    keys = [
+        "data",
+        "missing",
+        "missing.a.b",
+        "missing[0].a",
+        "missing[*].a",
+        "missing[*]",
+        "missing[:1]",
+        "data.patient.id",
+        "data.missing",
+        "data.missing[0]",
+        "data.missing.a",
+        "data.patient.missing",
+        "list_data[0].missing",
+        "(data,missing)",
+        "missing.(a,b)",
+        "missing..id",
+        "..id",
+        "*.patient",
+        "list_data[?patient.id=='abc123'].patient",
+    ]
+
+    def mapping(m: dict[str, Any]) -> dict[str, Any]:
+        return {
+            **{key: get(m, key, default="default") for key in keys},
+            "nested": get(m.get("data", {}), "missing", default="nested"),
+            "drop": {"a": 1, "b": get(m, "missing.a", drop_level=DROP.THIS_OBJECT)},
+        }
+
+    sources = [
+        simple_data,
+        {"data": {"patient": {"id": 1}}},
+        simple_data,
+        {"other": 1},
+        {"other": 1},
+    ]
+    cache = ShapeCache()
+    mapper = Mapper(mapping, remove_empty=False, shape_cache=cache)
+    assert mapper.map_many(sources) == Mapper(mapping, remove_empty=False).map_many(sources)
+    assert mapper.shape_cache is cache
+    # Three distinct shapes, so each path is checked against a source three times
+    assert len(cache.shapes) == 3
+    assert cache.misses == 3 * (len(keys) + 1)
+    assert cache.hits == 2 * (len(keys) + 1)
+    assert cache.hit_rate == 0.4
+    assert cache.shapes[(("other", None),)]["missing[*]"] is False
+    assert cache.shapes[(("other", None),)]["data.missing"] is True
+    skipped = cache.skipped
+    assert skipped > 0
+
+    # Bounded: new shapes aren't cached once full
+    full = Mapper(mapping, remove_empty=False, shape_cache=ShapeCache(max_shapes=1))
+    assert full.map_many(sources) == mapper.map_many(sources)
+    assert full.shape_cache is not None and len(full.shape_cache.shapes) == 1
+    assert cache.skipped == 2 * skipped
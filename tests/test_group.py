@@ -0,0 +1,76 @@
+from copy import deepcopy
+from typing import Any
+
+import pydian.partials as p
+from pydian import DROP, Mapper, get
+from pydian.group import MapperGroup
+from pydian.loaders import BatchLoader
+
+
+def test_mapper_group(nested_data: dict[str, Any]) -> None:
+    source = nested_data
+    original = deepcopy(source)
+
+    def ids(m: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "ids": get(m, "data[*].patient.id"),
+            "first": get(m, "data[0].patient", apply=p.get("id")),
+        }
+
+    def patients(m: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "patients": get(m, "data[*].patient"),
+            "ids": get(m, "data[*].patient.id", apply=p.map_to_list(str.upper)),
+            # Modifies a (shared) `get` result during post-processing
+            "dropped": [{"a": get(m, "data[0].patient"), "b": DROP.THIS_OBJECT}],
+        }
+
+    mappers = {
+        "ids": Mapper(ids),
+        "patients": Mapper(patients),
+        "template": Mapper({"ids": p.get("data[*].patient.id"), "missing": p.get("missing")}),
+    }
+    expected = {name: mapper(source) for name, mapper in mappers.items()}
+
+    group = MapperGroup(mappers)
+    assert group(source) == expected
+    assert source == original
+    # Each distinct key path is only resolved once
+    assert group.cache is not None
+    assert (group.cache.misses, group.cache.hits) == (5, 3)
+
+    threaded = MapperGroup(mappers, max_workers=3)
+    assert threaded.map_many([source, {}]) == [
+        expected,
+        {name: mapper({}) for name, mapper in mappers.items()},
+    ]
+    assert source == original
+
+    # Outside of a group, nothing is cached
+    assert Mapper(ids)(source) == expected["ids"]
+
+
+def test_mapper_group_errors_and_loaders(simple_data: dict[str, Any]) -> None:
+    calls: list[list[Any]] = []
+
+    def bulk_lookup(keys: list[Any]) -> dict[Any, Any]:
+        calls.append(keys)
+        return {k: k.upper() for k in keys}
+
+    loader = BatchLoader(bulk_lookup)
+    collecting = Mapper({"active": p.get("data.patient.active", apply=len)}, on_error="collect")
+    group = MapperGroup(
+        {
+            "loaded": Mapper(
+                {"names": p.get("list_data[*].patient.id", apply=p.map_to_list(loader.load))}
+            ),
+            "collecting": collecting,
+        }
+    )
+    assert (
+        group.map_many([simple_data, simple_data])
+        == [{"loaded": {"names": ["ABC123", "DEF456", "GHI789"]}, "collecting": {}}] * 2
+    )
+    # Batched once for all sources, and errors are collected on their own `Mapper`
+    assert calls == [["abc123", "def456", "ghi789"]]
+    assert len(collecting.errors) == 2
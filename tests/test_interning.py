@@ -0,0 +1,80 @@
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import pydian.partials as p
+from pydian import Mapper, Pipeline, get
+from pydian.interning import InternTable
+
+
+def test_intern_table() -> None:
+    table = InternTable(max_size=2, max_length=5)
+    a, b = "".join(["fin", "al"]), "".join(["fi", "nal"])
+    assert a is not b
+    assert table.intern(a) is a
+    assert table.intern(b) is a
+    assert (table.hits, table.misses, table.bytes_saved) == (1, 1, sys.getsizeof(b))
+    # Too long
+    long_value = "".join(["http://", "loinc.org"])
+    assert table.intern(long_value) is long_value
+    assert len(table) == 1
+    # Bounded
+    table.intern("x")
+    table.intern("y")
+    assert len(table) == 2
+    y = "".join(["y", ""])
+    assert table.intern(y) is y
+    table.clear()
+    assert len(table) == 0
+
+
+def test_intern_table_threads() -> None:
+    table = InternTable()
+    values = [f"value-{i % 50}" for i in range(1000)]
+    with ThreadPoolExecutor(4) as executor:
+        results = list(executor.map(lambda _: [table.intern(v) for v in values], range(8)))
+    # Every thread gets the same copy of each value, and no counts are lost
+    assert all(a is b for res in results for a, b in zip(res, results[0]))
+    assert table.hits + table.misses == 8000
+    assert len(table) == 50
+
+
+def test_intern_results() -> None:
+    table = InternTable()
+    shared = {"static": "value"}
+    results = json.loads('[{"status": "final", "list": ["a", 1]}, {"status": "final"}]')
+    results[0]["shared"] = shared
+    results[1]["shared"] = shared
+    interned = table.intern_results(results)
+    assert interned == results
+    assert interned[0] is not results[0]
+    first_keys, second_keys = list(interned[0]), list(interned[1])
+    assert first_keys[0] is second_keys[0]
+    assert interned[0]["status"] is interned[1]["status"]
+    # Shared containers stay shared
+    assert interned[0]["shared"] is interned[1]["shared"]
+    assert table.bytes_saved > 0
+
+
+def test_mapper_intern(simple_data: dict[str, Any]) -> None:
+    sources = [json.loads(json.dumps(simple_data)) for _ in range(3)]
+    mapper = Mapper({"data": p.get("data"), "id": p.get("data.patient.id")}, intern=True)
+    results = mapper.map_many(sources)
+    assert results == Mapper({"data": p.get("data"), "id": p.get("data.patient.id")}).map_many(
+        sources
+    )
+    assert results[0]["id"] is results[2]["id"]
+    assert list(results[0]["data"])[0] is list(results[1]["data"])[0]
+    assert mapper.intern_table is not None and mapper.intern_table.bytes_saved > 0
+    # Sources aren't modified
+    assert sources[0] == simple_data
+
+    # Tables can be shared, including an empty one
+    table = InternTable()
+    first = Mapper(lambda m: {"id": get(m, "data.patient.id")}, intern=table)(sources[0])
+    second = Pipeline(
+        [Mapper(lambda m: m), Mapper(lambda m: {"id": get(m, "data.patient.id")}, intern=table)]
+    )(sources[1])
+    assert first["id"] is second["id"]
+    assert Mapper(lambda m: m).intern_table is None
@@ -0,0 +1,77 @@
+from typing import Any
+
+import pydian.partials as p
+from pydian import DROP, Mapper, get
+from pydian.lib.types import Deferred
+from pydian.loaders import BatchLoader, resolve_deferred
+
+TERMINOLOGY = {"abc123": "Patient A", "def456": "Patient B", "ghi789": "Patient C"}
+
+
+def make_loader() -> tuple[BatchLoader, list[list[Any]]]:
+    calls: list[list[Any]] = []
+
+    def bulk_lookup(keys: list[Any]) -> dict[Any, Any]:
+        calls.append(keys)
+        return {k: TERMINOLOGY[k] for k in keys if k in TERMINOLOGY}
+
+    return BatchLoader(bulk_lookup), calls
+
+
+def test_batch_loader(simple_data: dict[str, Any]) -> None:
+    source = simple_data
+    loader, calls = make_loader()
+
+    def mapping(m: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "name": get(m, "data.patient.id", apply=[loader.load, str.upper]),
+            "names": get(m, "list_data[*].patient.id", apply=p.map_to_list(loader.load)),
+            "missing": get(m, "data.patient.active", apply=[str, loader.load, str.upper]),
+            "dropped": {
+                "a": "b",
+                "c": get(
+                    m, "data.patient.active", apply=[str, loader.load], drop_level=DROP.THIS_OBJECT
+                ),
+            },
+            "tuple": get(m, "data.patient.(id, active)", apply=p.map_to_list(loader.load)),
+        }
+
+    res = Mapper(mapping)(source)
+    assert res == {
+        "name": "PATIENT A",
+        "names": ["Patient A", "Patient B", "Patient C"],
+        "tuple": ["Patient A"],
+    }
+    # Only one lookup, with unique keys
+    assert calls == [["abc123", "def456", "ghi789", "True", True]]
+
+    # Cached values aren't looked up again
+    Mapper(mapping)(source)
+    assert len(calls) == 1
+
+
+def test_batch_loader_map_many(simple_data: dict[str, Any]) -> None:
+    loader, calls = make_loader()
+    mapper = Mapper({"id": p.get("patient.id"), "name": p.get("patient.id", apply=loader.load)})
+    res = mapper.map_many(simple_data["list_data"])
+    assert res == [
+        {"id": "abc123", "name": "Patient A"},
+        {"id": "def456", "name": "Patient B"},
+        {"id": "ghi789", "name": "Patient C"},
+    ]
+    assert calls == [["abc123", "def456", "ghi789"]]
+
+
+def test_batch_loader_sequence_result() -> None:
+    loader = BatchLoader(lambda keys: [k * 2 for k in keys])
+    res = Mapper({"doubled": p.get("values", apply=p.map_to_list(loader.load))})({"values": [1, 2]})
+    assert res == {"doubled": [2, 4]}
+
+
+def test_resolve_deferred() -> None:
+    loader, calls = make_loader()
+    # Outside of a `Mapper`, placeholders are returned as-is
+    res = get({"id": "abc123"}, "id", apply=[loader.load, str.lower])
+    assert isinstance(res, Deferred)
+    assert resolve_deferred([{"name": res}, [res]]) == [{"name": "patient a"}, ["patient a"]]
+    assert calls == [["abc123"]]
@@ -1,9 +1,16 @@
-from typing import Any
+import io
+import json
+import pickle
+import random
+from copy import deepcopy
+from typing import Any, Callable, cast
 
 import pytest
 
-from pydian import Mapper, get
-from pydian.lib.types import DROP, KEEP
+import pydian.partials as p
+from pydian import Mapper, Pipeline, get
+from pydian.lib.types import DROP, KEEP, ApplyError
+from pydian.loaders import BatchLoader
 
 
 def test_drop(simple_data: dict[str, Any]) -> None:
@@ -105,3 +112,304 @@ def test_keep_empty_value() -> None:
         "static_val": "Def",
         "empty_list": [],
     }
+
+
+def test_on_error(simple_data: dict[str, Any]) -> None:
+    source = simple_data
+
+    def mapping(m: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "id": get(m, "data.patient.id"),
+            "failed": get(m, "data.patient", apply=str.upper),
+            "failed_default": get(m, "data.patient.active", apply=len, default="n/a"),
+        }
+
+    with pytest.raises(ApplyError) as exc_info:
+        Mapper(mapping)(source)
+    error = cast(ApplyError, exc_info.value)
+    assert isinstance(error, RuntimeError)
+    assert (error.key, error.index) == ("data.patient", 0)
+    assert "data.patient" in str(error)
+
+    assert Mapper(mapping, on_error="default")(source) == {
+        "id": "abc123",
+        "failed_default": "n/a",
+    }
+
+    mapper = Mapper(mapping, on_error="collect")
+    assert mapper(source) == {"id": "abc123", "failed_default": "n/a"}
+    assert [(e.key, e.fn, type(e.exception)) for e in mapper.errors] == [
+        ("data.patient", str.upper, TypeError),
+        ("data.patient.active", len, TypeError),
+    ]
+    assert mapper.errors[0].value is source["data"]["patient"]
+
+    # Errors record the position of their source within the batch, and are kept until cleared
+    mapper.errors.clear()
+    sources: list[dict[str, Any]] = [{}, source, {}, source]
+    mapper.map_many(sources)
+    assert [e.index for e in mapper.errors] == [1, 1, 3, 3]
+    mapper.errors.clear()
+    mapper.map_threaded(sources, max_workers=2)
+    assert sorted(e.index for e in mapper.errors if e.index is not None) == [1, 1, 3, 3]
+    mapper.errors.clear()
+    pipeline = Mapper(lambda m: m).then(mapper)
+    pipeline.map_many(sources)
+    assert [e.index for e in mapper.errors] == [1, 1, 3, 3]
+
+    # Including errors in an `apply` chain that continues after a bulk lookup
+    loader = BatchLoader(lambda keys: {k: k for k in keys})
+    deferred_mapper = Mapper(
+        lambda m: {"id": get(m, "id", apply=[loader.load, int])}, on_error="collect"
+    )
+    assert deferred_mapper.map_many([{"id": "1"}, {"id": "a"}]) == [{"id": 1}, {}]
+    assert [e.index for e in deferred_mapper.errors] == [1]
+
+    with pytest.raises(ValueError):
+        Mapper(mapping, on_error="ignore")  # type: ignore
+
+
+def test_apply_error_lazy_repr() -> None:
+    large_value = ["value"] * 100_000
+    error = ApplyError("some.key", str.upper, TypeError("bad type"), large_value)
+    assert error.value is large_value
+    assert len(str(error)) < 500
+    assert len(repr(error)) < 500
+    assert error.index is None
+    copied = pickle.loads(pickle.dumps(error))
+    assert (copied.key, copied.value, copied.index) == ("some.key", large_value, None)
+
+
+def test_source_not_modified() -> None:
+    # Sources can contain DROP/KEEP objects, e.g. when mapping an intermediate result
+    source: dict[str, Any] = {
+        "data": {"nested": {"a": DROP.THIS_OBJECT}, "other": "value"},
+        "keep": {"value": KEEP(None)},
+        "list": [{"nested": {"a": DROP.THIS_OBJECT}}],
+    }
+    keep_value = source["keep"]["value"]
+    original = deepcopy(source)
+
+    def mapping(m: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "data": get(m, "data"),
+            "keep": get(m, "keep"),
+            "list": get(m, "list[*].nested"),
+            "first": get(m, "list[0]"),
+        }
+
+    for remove_empty in (True, False):
+        res = Mapper(mapping, remove_empty=remove_empty)(source)
+        assert source["keep"]["value"] is keep_value
+        source["keep"]["value"] = original["keep"]["value"]
+        assert source == original
+        source["keep"]["value"] = keep_value
+        assert res["data"]["other"] == "value"
+        assert res["keep"] == {"value": None}
+    assert res == {
+        "data": {"nested": None, "other": "value"},
+        "keep": {"value": None},
+        "list": [None],
+        "first": {"nested": None},
+    }
+    # Only containers that were modified are copied
+    unmodified_source = {"data": {"a": 1}, "b": "value"}
+    res = Mapper(lambda m: {"data": get(m, "data"), "b": DROP.THIS_OBJECT}, remove_empty=False)(
+        {**unmodified_source, "other": {}}
+    )
+    assert res == {}
+    res = Mapper(lambda m: {"data": get(m, "data"), "b": [DROP.THIS_OBJECT]}, remove_empty=False)(
+        unmodified_source
+    )
+    assert res == {"data": {"a": 1}, "b": None}
+    assert res["data"] is unmodified_source["data"]
+
+
+_KEYS = ("a", "b", "c")
+_EMPTY_VALUES: tuple[Any, ...] = (None, "", {}, [])
+
+
+def _random_value(rng: random.Random, depth: int) -> Any:
+    kinds = ("scalar", "empty", "dict", "dict", "list") if depth > 0 else ("scalar", "empty")
+    kind = rng.choice(kinds)
+    if kind == "scalar":
+        return rng.choice((0, 1, "x", False))
+    if kind == "empty":
+        return deepcopy(rng.choice(_EMPTY_VALUES))
+    if kind == "dict":
+        return {k: _random_value(rng, depth - 1) for k in rng.sample(_KEYS, rng.randint(1, 3))}
+    return [_random_value(rng, depth - 1) for _ in range(rng.randint(1, 2))]
+
+
+def _random_stage(rng: random.Random) -> Mapper:
+    """
+    Returns a mapper (either a function or a template) with randomly placed `get`s, empty
+      values, DROP and KEEP objects. Each dict has at most one DROP, and none are within lists.
+    """
+
+    def spec(depth: int) -> dict[str, Any]:
+        res: dict[str, Any] = {}
+        has_drop = False
+        for k in rng.sample(_KEYS, rng.randint(1, 3)):
+            kind = rng.choice(
+                ("get", "get", "value", "keep", "drop", "dict") if depth else ("get",)
+            )
+            if kind in ("get", "drop") and not has_drop and rng.random() < 0.4:
+                # A DROP.PARENT at the top level would go past the root
+                level = rng.choice(
+                    (DROP.THIS_OBJECT, DROP.PARENT) if depth < 2 else (DROP.THIS_OBJECT,)
+                )
+                has_drop = True
+                res[k] = ("drop", level) if kind == "drop" else ("get", _random_key(rng), level)
+            elif kind in ("get", "drop"):
+                res[k] = ("get", _random_key(rng), None)
+            elif kind == "value":
+                res[k] = ("value", _random_value(rng, 1))
+            elif kind == "keep":
+                res[k] = ("keep", rng.choice(_EMPTY_VALUES))
+            else:
+                res[k] = spec(depth - 1)
+        return res
+
+    def evaluate(spec: dict[str, Any], m: dict[str, Any] | None) -> dict[str, Any]:
+        res: dict[str, Any] = {}
+        for k, v in spec.items():
+            if isinstance(v, dict):
+                res[k] = evaluate(v, m)
+            elif v[0] == "get":
+                res[k] = (
+                    p.get(v[1], drop_level=v[2]) if m is None else get(m, v[1], drop_level=v[2])
+                )
+            elif v[0] == "value":
+                res[k] = deepcopy(v[1])
+            elif v[0] == "keep":
+                res[k] = KEEP(deepcopy(v[1]))
+            else:
+                res[k] = v[1]
+        return res
+
+    stage_spec = spec(2)
+    remove_empty = rng.random() < 0.7
+    if rng.random() < 0.5:
+        return Mapper(evaluate(stage_spec, None), remove_empty=remove_empty)
+    return Mapper(lambda m: evaluate(stage_spec, m), remove_empty=remove_empty)
+
+
+def _random_key(rng: random.Random) -> str:
+    key = ".".join(rng.choice(_KEYS) for _ in range(rng.randint(1, 3)))
+    return key.replace(".", "[0].", 1) if rng.random() < 0.2 else key
+
+
+def _outcome(fn: Callable[[], Any]) -> Any:
+    try:
+        return fn()
+    except Exception as e:
+        return type(e)
+
+
+def test_pipeline() -> None:
+    rng = random.Random(0)
+    for _ in range(500):
+        sources = [_random_value(rng, 3) for _ in range(2)]
+        sources = [s if isinstance(s, dict) else {"a": s} for s in sources]
+        originals = deepcopy(sources)
+        stages = [_random_stage(rng) for _ in range(rng.randint(2, 3))]
+
+        def chained(source: dict[str, Any]) -> dict[str, Any]:
+            res = source
+            for stage in stages:
+                res = stage(res)
+            return res
+
+        pipeline = Pipeline(stages[:1]).then(Pipeline(stages[1:]))
+        assert isinstance(stages[0].then(stages[1]), Pipeline)
+        expected = [_outcome(lambda: chained(s)) for s in sources]
+        assert [_outcome(lambda: pipeline(s)) for s in sources] == expected
+        if all(isinstance(res, dict) for res in expected):
+            assert pipeline.map_many(sources) == expected
+        assert sources == originals
+
+
+def test_dumps(nested_data: dict[str, Any]) -> None:
+    source = nested_data
+
+    def mapping(m: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "ids": get(m, "data[*].patient.id"),
+            "patients": [
+                {
+                    "id": get(d, "patient.id"),
+                    "dict": get(d, "patient.dict"),
+                    "ints": get(d, "patient.ints", drop_level=DROP.THIS_OBJECT),
+                }
+                for d in get(m, "data", default=[])
+            ],
+            "drop_parent": {"a": {"b": DROP.PARENT}, "c": "d"},
+            "drop_in_list": [{"a": DROP.THIS_OBJECT}, {"a": "b"}, [None, 1]],
+            "empty": {"a": None, "b": "", "c": [{}, [None]], "d": ()},
+            "keep": {"a": KEEP(""), "b": [KEEP(None), None], "c": KEEP({"d": None})},
+            "scalars": [1, -2.5, float("inf"), True, False, 'ünïcode "quoted"\n', (1, None)],
+            "keys": {1: "int", 2.5: "float", None: "none", True: "bool"},
+        }
+
+    for remove_empty in (True, False):
+        mapper = Mapper(mapping, remove_empty=remove_empty)
+        assert mapper.dumps(source) == json.dumps(mapper(source))
+        assert mapper.dumps({}) == json.dumps(mapper({}))
+    assert source == nested_data
+
+    # Dropping the entire result, or past it
+    assert Mapper(lambda m: {"a": {"b": DROP.PARENT}, "c": "d"}).dumps(source) == "{}"
+    with pytest.raises(RuntimeError):
+        Mapper(lambda m: {"a": {"b": DROP.GREATGRANDPARENT}}).dumps(source)
+    # One level past the root, same as calling the mapper
+    for out_of_bounds in (Mapper(lambda m: {"k": DROP.PARENT}), Mapper({"k": DROP.PARENT})):
+        with pytest.raises(RuntimeError):
+            out_of_bounds({})
+        with pytest.raises(RuntimeError):
+            out_of_bounds.dumps({})
+
+    # Templates, with static subtrees encoded once
+    template = {
+        "static": {"a": KEEP(""), "b": [1, None]},
+        "id": p.get("data[0].patient.id"),
+        "nested": [{"ints": p.get("data[0].patient.ints")}, {"missing": p.get("missing")}, "x"],
+        "dropped": {"a": p.get("missing", drop_level=DROP.THIS_OBJECT)},
+    }
+    for remove_empty in (True, False):
+        mapper = Mapper(template, remove_empty=remove_empty)
+        assert mapper.dumps(source) == json.dumps(mapper(source))
+        assert mapper.dumps(source) == json.dumps(mapper(source))
+    assert Mapper({"a": {"b": "c"}}).dumps(source) == '{"a": {"b": "c"}}'
+
+    # Writing to text and binary files
+    mapper = Mapper(mapping)
+    text, binary = io.StringIO(), io.BytesIO()
+    mapper.dump(source, text)
+    mapper.dump(source, binary)
+    assert text.getvalue() == binary.getvalue().decode() == mapper.dumps(source)
+
+
+def test_map_threaded(nested_data: dict[str, Any]) -> None:
+    sources = [{"data": nested_data["data"][i : i + 1]} for i in range(len(nested_data["data"]))]
+    sources += [{}] * 5
+
+    def mapping(m: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "ids": get(m, "data[*].patient.id"),
+            "first": {
+                "id": get(m, "data[0].patient.id"),
+                "drop?": get(m, "x", drop_level=DROP.THIS_OBJECT),
+            },
+            "active": get(m, "data[0].patient.active", apply=len),
+        }
+
+    mapper = Mapper(mapping, on_error="collect", intern=True)
+    expected = Mapper(mapping, on_error="default").map_many(sources)
+    assert mapper.map_threaded(sources, max_workers=3) == expected
+    # Results keep their order, and errors are collected from every thread
+    assert len(mapper.errors) == len(nested_data["data"])
+    assert mapper.map_threaded([], max_workers=3) == []
+
+    pipeline = Mapper(mapping, on_error="default").then(Mapper(lambda m: {"ids": get(m, "ids")}))
+    assert pipeline.map_threaded(sources, max_workers=2) == pipeline.map_many(sources)
@@ -0,0 +1,106 @@
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+import pydian.ndjson
+import pydian.partials as p
+from pydian import Mapper
+from pydian.ndjson import LineIndex, read_range
+
+
+@pytest.fixture
+def ndjson_path(tmp_path: Path) -> str:
+    records = [{"id": i, "name": f"patient {i}"} for i in range(10)]
+    lines = [json.dumps(r) for r in records]
+    # Blank and `\r\n` lines, with no trailing newline
+    content = (
+        "\n".join(lines[:3]) + "\n\n" + "\r\n".join(lines[3:6]) + "\r\n\r\n" + "\n".join(lines[6:])
+    )
+    path = tmp_path / "records.ndjson"
+    path.write_text(content)
+    return str(path)
+
+
+def test_line_index(ndjson_path: str) -> None:
+    with LineIndex(ndjson_path) as index:
+        assert len(index) == 10
+        assert index.record(0) == {"id": 0, "name": "patient 0"}
+        assert index[4] == {"id": 4, "name": "patient 4"}
+        assert index[-1] == {"id": 9, "name": "patient 9"}
+        assert index.line(3) == b'{"id": 3, "name": "patient 3"}'
+        assert [r["id"] for r in index.iter_range()] == list(range(10))
+
+
+def test_line_index_ranges(ndjson_path: str) -> None:
+    with LineIndex(ndjson_path) as index:
+        ranges = index.ranges(3)
+        assert len(ranges) == 3
+        assert ranges[0][0] == 0 and ranges[-1][1] == index.size
+        assert [index.range_records(*r) for r in ranges] == [(0, 3), (3, 6), (6, 10)]
+        # Workers can parse their range with or without the index
+        mapper = Mapper({"id": p.get("id")})
+        for start, end in ranges:
+            from_index = mapper.map_many(index.iter_range(start, end))
+            assert from_index == mapper.map_many(read_range(ndjson_path, start, end))
+        assert [
+            r["id"] for start, end in ranges for r in read_range(ndjson_path, start, end)
+        ] == list(range(10))
+        # More ranges than records
+        assert len(index.ranges(20)) == 10
+        with pytest.raises(ValueError):
+            index.ranges(0)
+
+
+def test_line_index_save_load(ndjson_path: str, tmp_path: Path) -> None:
+    index_path = str(tmp_path / "records.idx")
+    with LineIndex(ndjson_path) as index:
+        index.save(index_path)
+        offsets = index.offsets
+    with LineIndex.load(ndjson_path, index_path) as loaded:
+        assert loaded.offsets == offsets
+        assert loaded[7] == {"id": 7, "name": "patient 7"}
+
+    # Stale or invalid indexes, including a rewrite of the same size
+    content = Path(ndjson_path).read_bytes()
+    stat = os.stat(ndjson_path)
+    Path(ndjson_path).write_bytes(content.replace(b"patient 1", b"patient 9"))
+    assert os.path.getsize(ndjson_path) == stat.st_size
+    os.utime(ndjson_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    with pytest.raises(ValueError):
+        LineIndex.load(ndjson_path, index_path)
+    with open(ndjson_path, "a") as f:
+        f.write('\n{"id": 10}')
+    with pytest.raises(ValueError):
+        LineIndex.load(ndjson_path, index_path)
+    with pytest.raises(ValueError):
+        LineIndex.load(ndjson_path, ndjson_path)
+
+
+def test_line_index_closes_file_on_error(ndjson_path: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    files: list[Any] = []
+
+    def tracked_open(*args: Any) -> Any:
+        files.append(open(*args))
+        return files[-1]
+
+    def failing_scan(*_: Any) -> Any:
+        raise MemoryError
+
+    monkeypatch.setattr(pydian.ndjson, "open", tracked_open, raising=False)
+    monkeypatch.setattr(pydian.ndjson, "_scan_offsets", failing_scan)
+    with pytest.raises(MemoryError):
+        LineIndex(ndjson_path)
+    assert len(files) == 1 and files[0].closed
+
+
+def test_line_index_empty_file(tmp_path: Path) -> None:
+    path = tmp_path / "empty.ndjson"
+    path.write_text("")
+    with LineIndex(str(path)) as index:
+        assert len(index) == 0
+        assert index.ranges(4) == []
+        assert list(index.iter_range()) == []
+    assert list(read_range(str(path), 0, 10)) == []
@@ -0,0 +1,99 @@
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+import pydian.partials as p
+from pydian import DROP, Mapper, get
+from pydian.lib.types import KEEP
+from pydian.observers import FileExporter, HistogramObserver, MapperMetrics, Observer
+
+
+class ListObserver(Observer):
+    def __init__(self) -> None:
+        self.calls: list[MapperMetrics] = []
+
+    def observe(self, metrics: MapperMetrics) -> None:
+        self.calls.append(metrics)
+
+
+def test_observer(simple_data: dict[str, Any]) -> None:
+    source = simple_data
+
+    def mapping(m: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "id": get(m, "data.patient.id"),
+            "dropped": {"a": "b", "missing": get(m, "missing", drop_level=DROP.THIS_OBJECT)},
+            "empty": [None, {}],
+        }
+
+    observer = ListObserver()
+    mapper = Mapper(mapping, observer=observer)
+    assert mapper(source) == Mapper(mapping)(source) == {"id": "abc123"}
+
+    (metrics,) = observer.calls
+    assert set(metrics.timings) == {"map", "drop", "remove_empty", "keep"}
+    assert all(t >= 0 for t in metrics.timings.values())
+    assert metrics.input_nodes == 18
+    assert metrics.output_nodes == 2
+    assert metrics.drops_applied == 1
+    # `dropped` (now `None`), `empty` and its 2 items
+    assert metrics.empties_removed == 4
+
+    # Imputing KEEP objects doesn't count as removing (or adding) values
+    observer = ListObserver()
+    Mapper(lambda _: {"kept": KEEP({"a": [1, 2]}), "b": ""}, observer=observer)({})
+    Mapper({"kept": KEEP({"a": [1, 2]}), "id": p.get("id")}, observer=observer)({})
+    assert [m.empties_removed for m in observer.calls] == [1, 1]
+
+    with pytest.raises(TypeError):
+        Observer()  # type: ignore[abstract]
+
+
+def test_observer_template(simple_data: dict[str, Any]) -> None:
+    observer = ListObserver()
+    mapper = Mapper(
+        {"id": p.get("data.patient.id"), "missing": p.get("missing", drop_level=DROP.THIS_OBJECT)},
+        observer=observer,
+    )
+    assert mapper(simple_data) == {}
+    assert observer.calls[0].drops_applied == 1
+    # Empty values and KEEP objects are handled in one pass
+    assert set(observer.calls[0].timings) == {"map", "drop", "finalize"}
+
+
+def test_histogram_observer(simple_data: dict[str, Any], tmp_path: Path) -> None:
+    observer = HistogramObserver()
+    mapper = Mapper({"id": p.get("data.patient.id")}, observer=observer)
+    for _ in range(10):
+        mapper(simple_data)
+
+    summary = observer.summary()
+    assert summary["timings.map"]["count"] == 10
+    assert summary["output_nodes"] == {
+        "count": 10,
+        "mean": 2,
+        "min": 2,
+        "max": 2,
+        "p50": 2,
+        "p90": 2,
+        "p99": 2,
+    }
+    assert summary["drops_applied"]["p99"] == 0
+
+    summary_path = tmp_path / "summary.json"
+    observer.export(str(summary_path))
+    assert json.loads(summary_path.read_text()) == summary
+
+
+def test_file_exporter(simple_data: dict[str, Any], tmp_path: Path) -> None:
+    path = tmp_path / "metrics.jsonl"
+    mapper = Mapper({"id": p.get("data.patient.id")}, observer=FileExporter(str(path)))
+    mapper(simple_data)
+    mapper(simple_data)
+
+    lines = [json.loads(l) for l in path.read_text().splitlines()]
+    assert len(lines) == 2
+    assert lines[0]["output_nodes"] == 2
+    assert set(lines[0]["timings"]) == {"map", "drop", "finalize"}
@@ -1,5 +1,7 @@
 from copy import deepcopy
-from typing import Any
+from typing import Any, Sequence
+
+import pytest
 
 import pydian.partials as p
 
@@ -120,3 +122,35 @@ def test_stdlib_wrappers() -> None:
     EXAMPLE_LIST = ["a", "b", "c"]
     assert p.map_to_list(str.upper)(EXAMPLE_LIST) == ["A", "B", "C"]
     assert p.filter_to_list(p.equals("a"))(EXAMPLE_LIST) == ["a"]
+
+
+def test_elementwise_wrappers() -> None:
+    floats = [float(i) / 4 for i in range(-100, 100)]
+    ints = list(range(-100, 100))
+    mixed = [1, 2.5, True, -3.0] * 20
+    funcs = [
+        p.add(1),
+        p.subtract(0.5, before=True),
+        p.multiply(1000),
+        p.divide(4),
+        p.gt(3),
+        p.lte(-2.5),
+        p.equals(0.5),
+        p.not_equal(1),
+    ]
+    # Same results as calling per element
+    cases: list[Sequence[Any]] = [floats, ints, mixed, tuple(floats), floats[:3], []]
+    for values in cases:
+        for fn in funcs:
+            assert p.map_to_list(fn)(values) == [fn(v) for v in values]
+            assert p.filter_to_list(fn)(values) == [v for v in values if fn(v)]
+            assert p.map_to_list(fn)(iter(values)) == [fn(v) for v in values]
+    assert all(type(v) is int for v in p.map_to_list(p.multiply(2))(ints))
+    assert all(type(v) is bool for v in p.map_to_list(p.gt(0))(floats))
+
+    # The operator is applied to each element as is, so it isn't limited to numbers
+    assert p.map_to_list(p.add("!"))(["a", "b"]) == ["a!", "b!"]
+    assert p.filter_to_list(p.gt("b"))(["a", "c"]) == ["c"]
+
+    with pytest.raises(ZeroDivisionError):
+        p.map_to_list(p.divide(1, before=True))(floats)
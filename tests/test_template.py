@@ -0,0 +1,192 @@
+from typing import Any
+
+import pytest
+
+import pydian.partials as p
+from pydian import DROP, Mapper, get
+from pydian.lib.types import KEEP
+from pydian.template import LazyResult, Template
+
+
+def test_template(nested_data: dict[str, Any]) -> None:
+    source = nested_data
+
+    def mapping(m: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "CASE_constant": 123,
+            "CASE_static": {"system": "http://loinc.org", "codes": ["a", "b"], "empty": {}},
+            "CASE_empty_static": {"a": None, "b": [{}, ""]},
+            "CASE_unwrap_id": get(m, "data[*].patient.id"),
+            "CASE_nested": [
+                {"static": "abc", "id": get(m, "data[0].patient.id", apply=str.upper)},
+                {"missing": get(m, "missing.key")},
+                "static",
+            ],
+            "CASE_drop": {
+                "static": "Dropped",
+                "missing": get(m, "missing.key", drop_level=DROP.THIS_OBJECT),
+            },
+            "CASE_drop_parent": [
+                {"a": DROP.PARENT},
+                {"static": "Dropped"},
+            ],
+            "CASE_keep": {"dynamic": get(m, "missing.key", default=KEEP([])), "static": KEEP("")},
+        }
+
+    template = {
+        "CASE_constant": 123,
+        "CASE_static": {"system": "http://loinc.org", "codes": ["a", "b"], "empty": {}},
+        "CASE_empty_static": {"a": None, "b": [{}, ""]},
+        "CASE_unwrap_id": p.get("data[*].patient.id"),
+        "CASE_nested": [
+            {"static": "abc", "id": p.get("data[0].patient.id", apply=str.upper)},
+            {"missing": p.get("missing.key")},
+            "static",
+        ],
+        "CASE_drop": {
+            "static": "Dropped",
+            "missing": p.get("missing.key", drop_level=DROP.THIS_OBJECT),
+        },
+        "CASE_drop_parent": [
+            {"a": DROP.PARENT},
+            {"static": "Dropped"},
+        ],
+        "CASE_keep": {"dynamic": p.get("missing.key", default=KEEP([])), "static": KEEP("")},
+    }
+
+    for remove_empty in (True, False):
+        mapper = Mapper(mapping, remove_empty=remove_empty)
+        template_mapper = Mapper(template, remove_empty=remove_empty)
+        assert template_mapper(source) == mapper(source)
+        assert template_mapper.lazy(source).materialize() == mapper(source)
+
+    assert Mapper(template)(source) == {
+        "CASE_constant": 123,
+        "CASE_static": {"system": "http://loinc.org", "codes": ["a", "b"]},
+        "CASE_unwrap_id": ["abc123", "def456", "ghi789", "jkl101112"],
+        "CASE_nested": [{"static": "abc", "id": "ABC123"}, "static"],
+        "CASE_keep": {"dynamic": [], "static": ""},
+    }
+
+
+def test_template_drop_entire_object() -> None:
+    template = {
+        "static": "abc",
+        "parent": {"dropped": p.get("missing", drop_level=DROP.PARENT)},
+    }
+    assert Mapper(template)({}) == {}
+    assert Mapper(template)({"missing": "here"}) == {"static": "abc", "parent": {"dropped": "here"}}
+
+
+def test_template_static_subtrees() -> None:
+    template = {
+        "meta": {"profile": ["http://example.com/profile"]},
+        "id": p.get("id"),
+    }
+    compiled = Template(template)
+    mapper = Mapper(template)
+    first, second = mapper({"id": "a"}), mapper({"id": "b"})
+    assert first == {"meta": {"profile": ["http://example.com/profile"]}, "id": "a"}
+    # Each result has its own copy of static subtrees
+    first["meta"]["profile"].append("changed")
+    assert second["meta"] == template["meta"] == {"profile": ["http://example.com/profile"]}
+    assert compiled({"id": "c"})["meta"] == template["meta"]
+
+    # Including fully static templates
+    static_mapper = Mapper({"a": {"b": "c"}, "d": None})
+    res = static_mapper({})
+    assert res == {"a": {"b": "c"}}
+    res["new"] = 1
+    res["a"]["b"] = "changed"
+    assert static_mapper({}) == {"a": {"b": "c"}}
+
+
+def test_template_keep_none() -> None:
+    templates: list[dict[str, Any]] = [
+        {"o0": KEEP(None)},
+        {"o0": {"a": KEEP(None)}},
+        {"o0": [KEEP(None), None]},
+    ]
+    for template in templates:
+        assert Mapper(template)({}) == Mapper(lambda _: template)({})
+        assert Mapper(template).dumps({}) == Mapper(lambda _: template).dumps({})
+    assert Mapper({"o0": KEEP(None)})({}) == {"o0": None}
+    assert Mapper({"o0": KEEP(None), "o1": p.get("x")})({}) == {"o0": None}
+
+
+def test_lazy_result(simple_data: dict[str, Any]) -> None:
+    source = simple_data
+    calls: list[Any] = []
+
+    def tracked(v: Any) -> Any:
+        calls.append(v)
+        return v
+
+    template = {
+        "id": p.get("data.patient.id"),
+        "active": p.get("data.patient.active", apply=tracked),
+        "nested": {"ids": p.get("list_data[*].patient.id"), "static": "abc"},
+        "missing": p.get("missing.key"),
+        "dropped": {"a": p.get("missing.key", drop_level=DROP.THIS_OBJECT), "b": "c"},
+        "static": {"a": KEEP("")},
+    }
+    mapper = Mapper(template)
+    res = mapper.lazy(source)
+    assert isinstance(res, LazyResult)
+    assert res["id"] == "abc123"
+    assert res.get("missing") is None and "missing" not in res
+    assert "dropped" not in res
+    assert res["static"] == {"a": ""}
+    # Other fields aren't evaluated until accessed
+    assert calls == []
+    assert res["active"] is True
+    assert res["active"] is True
+    assert calls == [True]
+    assert res.materialize() == mapper(source)
+    assert list(res) == ["id", "active", "nested", "static"]
+    assert len(res) == 4 and dict(res) == res.materialize()
+    with pytest.raises(KeyError):
+        res["not_in_template"]
+    with pytest.raises(TypeError):
+        res["id"] = "read-only"  # type: ignore
+
+    # Static fields are copied, so changing a result doesn't change the template
+    for static_mapper in (mapper, Mapper({"static": {"a": [1]}})):
+        static_mapper.lazy(source).materialize()["static"]["a"] = "changed"
+        assert static_mapper(source) == static_mapper.lazy(source).materialize()
+        assert static_mapper.lazy(source)["static"]["a"] != "changed"
+
+    # Only template mappers can be lazy
+    with pytest.raises(ValueError):
+        Mapper(lambda m: m).lazy(source)
+
+
+def test_lazy_result_drop_entire_object() -> None:
+    calls: list[str] = []
+
+    def tracked(m: dict[str, Any]) -> Any:
+        calls.append("tracked")
+        return m.get("value")
+
+    template = {
+        "static": "abc",
+        "parent": {"dropped": p.get("missing", drop_level=DROP.PARENT)},
+        # Can't drop the root. Other callables might, so are evaluated first too
+        "child": {"dropped": p.get("missing", drop_level=DROP.THIS_OBJECT)},
+        "value": tracked,
+    }
+    mapper = Mapper(template)
+    res = mapper.lazy({})
+    # Fields that may drop the result are evaluated first
+    assert "static" not in res and res.materialize() == {} == mapper({})
+    assert calls == ["tracked"]
+
+    res = mapper.lazy({"missing": "here", "value": 1})
+    assert res["static"] == "abc"
+    assert res.materialize() == mapper({"missing": "here", "value": 1})
+
+    # Errors are collected on the `Mapper` on access
+    mapper = Mapper({"a": p.get("a", apply=int), "b": p.get("b")}, on_error="collect")
+    res = mapper.lazy({"a": "x", "b": "y"})
+    assert res["b"] == "y" and not mapper.errors
+    assert "a" not in res and len(mapper.errors) == 1